@@ -0,0 +1,152 @@
+"""Single-file inference artifact fusing feature selection, scaler and KNN model.
+
+Layout: a 16-byte magic, the little-endian uint64 length of a JSON header,
+the header itself, then every array as raw C-contiguous data aligned to
+64 bytes. The header records the feature order, the KNN parameters, the
+class labels and the dtype/shape/offset of each array, so the arrays can be
+memory-mapped straight from the file:
+
+  affine  float32 (2, n_features)  row 0 = scale, row 1 = offset of the scaler
+  fit_X   float32 (n_samples, n_features)  scaled training matrix
+  fit_y   int32   (n_samples,)  index of each training sample's class
+"""
+import json
+import struct
+import time
+from operator import itemgetter
+
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+MAGIC = b"AI4TRIAGE-MODEL\x00"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+def fold_scaler(scaler, features):
+    """Return the (2, n_features) float32 [scale; offset] equivalent of `scaler` for `features`."""
+    n = len(features)
+    if scaler is None:
+        scale, offset = np.ones(n), np.zeros(n)
+    elif isinstance(scaler, MinMaxScaler):
+        scale, offset = scaler.scale_, scaler.min_
+    elif isinstance(scaler, StandardScaler):
+        scale = 1.0 / scaler.scale_ if scaler.scale_ is not None else np.ones(scaler.n_features_in_)
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(scaler.n_features_in_)
+        offset = -mean * scale
+    else:
+        raise ValueError(f"Cannot fold scaler of type {type(scaler).__name__}")
+
+    names = getattr(scaler, "feature_names_in_", None)
+    if names is not None:
+        # Reorder the scaler's parameters to the artifact's feature order
+        position = {name: i for i, name in enumerate(names)}
+        missing = [f for f in features if f not in position]
+        if missing:
+            raise ValueError(f"Scaler was not fitted on features: {missing}")
+        order = [position[f] for f in features]
+        scale, offset = np.asarray(scale)[order], np.asarray(offset)[order]
+    if len(scale) != n:
+        raise ValueError(f"Scaler has {len(scale)} features, expected {n}")
+    return np.ascontiguousarray(np.vstack([scale, offset]), dtype=np.float32)
+
+
+def write_artifact(path, model, scaler, features, version=None):
+    """Bundle a fitted KNeighborsClassifier, its scaler and feature list into one artifact file."""
+    if not isinstance(model, KNeighborsClassifier):
+        raise ValueError(f"Only exact KNeighborsClassifier models can be exported, got {type(model).__name__}")
+    fit_X = np.ascontiguousarray(model._fit_X, dtype=np.float32)
+    if fit_X.shape[1] != len(features):
+        raise ValueError(f"Model was fitted on {fit_X.shape[1]} features, feature list has {len(features)}")
+    arrays = {
+        "affine": fold_scaler(scaler, features),
+        "fit_X": fit_X,
+        "fit_y": np.ascontiguousarray(model._y, dtype=np.int32),
+    }
+
+    offset = 0
+    layout = {}
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = {
+        "format_version": FORMAT_VERSION,
+        "version": version or time.strftime("%Y%m%dT%H%M%S"),
+        "features": list(features),
+        "n_neighbors": int(model.n_neighbors),
+        "weights": model.weights,
+        "metric": model.metric,
+        "p": model.p,
+        "metric_params": model.metric_params,
+        "classes": model.classes_.tolist(),
+        "arrays": layout,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _data_start(len(header_bytes))
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    return header
+
+
+def _data_start(header_length):
+    end = len(MAGIC) + 8 + header_length
+    return -(-end // ALIGNMENT) * ALIGNMENT
+
+
+def read_header(path):
+    """Read and validate the JSON header of an artifact."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an AI4TRIAGE inference artifact")
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version {header.get('format_version')} in {path}")
+    header["data_start"] = _data_start(length)
+    return header
+
+
+class InferenceArtifact:
+    """Loaded artifact: turns records into the feature matrix and predicts their labels."""
+
+    def __init__(self, path, mmap=True):
+        header = read_header(path)
+        self.version = header["version"]
+        self.features = header["features"]
+        self.column_index = {feature: i for i, feature in enumerate(self.features)}
+        self.classes = np.asarray(header["classes"])
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            offset = header["data_start"] + spec["offset"]
+            if mmap:
+                arrays[name] = np.memmap(path, dtype=spec["dtype"], mode="r", offset=offset, shape=tuple(spec["shape"]))
+            else:
+                count = int(np.prod(spec["shape"]))
+                arrays[name] = np.fromfile(path, dtype=spec["dtype"], count=count, offset=offset).reshape(spec["shape"])
+        self.scale, self.offset = arrays["affine"]
+        # Brute force over the stored matrix needs no tree building, so loading stays O(1)
+        self.model = KNeighborsClassifier(n_neighbors=header["n_neighbors"], weights=header["weights"],
+                                          metric=header["metric"], p=header["p"],
+                                          metric_params=header["metric_params"], algorithm="brute")
+        self.model.fit(arrays["fit_X"], arrays["fit_y"])
+        self._select = itemgetter(*self.features)
+
+    def records_to_matrix(self, records):
+        """Build the float32 feature matrix from a list of dict records (KeyError on a missing feature)."""
+        matrix = np.array([self._select(record) for record in records], dtype=np.float32)
+        return matrix.reshape(len(records), len(self.features))
+
+    def transform(self, X):
+        return X * self.scale + self.offset
+
+    def predict(self, X):
+        """Scale a raw feature matrix (columns in `features` order) and predict its labels."""
+        return self.classes[self.model.predict(self.transform(X))]
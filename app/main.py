@@ -1,9 +1,19 @@
 import sys
 import pandas as pd
+import numpy as np
 import joblib
 import paho.mqtt.client as mqtt
 import os
 import json
+import queue
+import threading
+import time
+import itertools
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from inference_artifact import InferenceArtifact, read_header
+from mqtt_publisher import MQTTPublisher
+from wire_format import CAPABILITIES_TOPIC, SUPPORTED_FORMATS, ColumnarBlock, decode, is_columnar
 # from sklearn.preprocessing import StandardScaler
 
 # Configuration
@@ -13,10 +23,35 @@ RESULTS_TOPIC = "ai4triage/results"
 MODEL_PATH = '/app/models/knn_model.joblib'
 SCALER_PATH = '/app/models/scaler.pkl'
 FEATURES_FILE= '/top_features.csv'
+# Fused features/scaler/model artifact from dataset/export_model.py, used instead of the three files above when present
+ARTIFACT_PATH = os.environ.get("AI4TRIAGE_MODEL_ARTIFACT", '/app/models/knn_model.ai4t')
+# joblib mmap mode for the model's arrays, so every worker on the host shares one page-cache copy ("" disables)
+MODEL_MMAP_MODE = os.environ.get("AI4TRIAGE_MODEL_MMAP_MODE", "r") or None
+# Micro-batching: flush after BATCH_MAX_ROWS records or BATCH_MAX_DELAY seconds
+BATCH_MAX_ROWS = int(os.environ.get("AI4TRIAGE_BATCH_MAX_ROWS", 2000))
+BATCH_MAX_DELAY = float(os.environ.get("AI4TRIAGE_BATCH_MAX_DELAY", 0.02))
+# Prediction worker processes (0 predicts on the batching thread) and bound of the intake queue, in messages
+PREDICT_WORKERS = int(os.environ.get("AI4TRIAGE_PREDICT_WORKERS", os.cpu_count() or 1))
+INTAKE_QUEUE_SIZE = int(os.environ.get("AI4TRIAGE_INTAKE_QUEUE_SIZE", 10000))
+# Seconds a message waits for room in a full intake queue before it is dropped; submit runs on
+# paho's network thread, so keep this well under MQTT_KEEPALIVE
+INTAKE_TIMEOUT = float(os.environ.get("AI4TRIAGE_INTAKE_TIMEOUT", 5))
+MQTT_KEEPALIVE = 60
 
-# Load pre-trained model and scaler
-model = joblib.load(MODEL_PATH)
-scaler = joblib.load(SCALER_PATH)
+# Pre-trained model and scaler (or the artifact), loaded by load_model() in the process that predicts
+model = None
+scaler = None
+artifact = None
+
+def load_model():
+    """Load the inference artifact, or the pre-trained model and scaler, into this process."""
+    global model, scaler, artifact
+    if os.path.exists(ARTIFACT_PATH):
+        artifact = InferenceArtifact(ARTIFACT_PATH)  # Arrays are memory-mapped, not copied
+        print(f"Loaded inference artifact {artifact.version} from {ARTIFACT_PATH}")
+    else:
+        model = joblib.load(MODEL_PATH, mmap_mode=MODEL_MMAP_MODE)
+        scaler = joblib.load(SCALER_PATH)
 
 def select_features(features_file):
     try:
@@ -27,8 +62,11 @@ def select_features(features_file):
         sys.exit(1)
     return selected_features
 
-# Important features based on prior analysis
-IMPORTANT_FEATURES = select_features(FEATURES_FILE)
+# Important features based on prior analysis (the artifact carries its own list)
+if os.path.exists(ARTIFACT_PATH):
+    IMPORTANT_FEATURES = read_header(ARTIFACT_PATH)["features"]
+else:
+    IMPORTANT_FEATURES = select_features(FEATURES_FILE)
 
 def process_log(file_path):
     """Process log file to extract features."""
@@ -44,32 +82,188 @@ def normalize_and_predict(data):
     predictions = model.predict(normalized_data)
     return predictions
 
+def records_to_features(records):
+    """Select the model features from a list of JSON records."""
+    if artifact is not None:
+        return artifact.records_to_matrix(records)
+    df = pd.DataFrame(records)
+    return df[IMPORTANT_FEATURES]  # Select the relevant features
+
+def predict_messages(messages):
+    """Predict the rows of several messages (JSON record lists or columnar blocks) in one call."""
+    parts, records = [], []
+    for message in messages:
+        if isinstance(message, ColumnarBlock):
+            if records:
+                parts.append(records_to_features(records))
+                records = []
+            parts.append(message.select(IMPORTANT_FEATURES))
+        else:
+            records.extend(message)
+    if records:
+        parts.append(records_to_features(records))
+    if artifact is not None:
+        return artifact.predict(np.vstack(parts))
+    if len(parts) == 1 and isinstance(parts[0], pd.DataFrame):
+        return normalize_and_predict(parts[0])
+    features = np.vstack([np.asarray(part, dtype=np.float64) for part in parts])
+    return normalize_and_predict(pd.DataFrame(features, columns=IMPORTANT_FEATURES))
+
 def save_results(data, predictions, output_path):
     """Save prediction results to CSV."""
     data['prediction'] = predictions
     data.to_csv(output_path, index=False)
     return output_path
 
+_publisher = None
+
+def get_publisher():
+    """Return the process-wide publisher, connecting it on first use."""
+    global _publisher
+    if _publisher is None:
+        _publisher = MQTTPublisher(BROKER)
+    return _publisher
+
 def send_to_mqtt(data):
     """Send data to MQTT broker."""
-    client = mqtt.Client()
-    client.connect(BROKER, 1883, 60)
-    client.publish(RESULTS_TOPIC, json.dumps(data))
-    client.disconnect()
+    get_publisher().publish(RESULTS_TOPIC, json.dumps(data))
+
+class MicroBatcher:
+    """Collect records from several MQTT messages and predict them in one call.
+
+    Messages are queued by `submit`; a background thread drains the queue until
+    `max_rows` records are pending or `max_delay` seconds have passed since the
+    first one arrived and hands the whole batch to `executor` (or predicts it
+    inline when there is none). A second thread waits for the batches in
+    submission order and publishes each message's slice of the predictions.
+
+    Every message gets a sequence number, published with its results as
+    `{"message_id": n, "predictions": [...]}`. A message that cannot be
+    predicted is answered with `{"message_id": n, "error": ...}` instead, so
+    consumers can always match results to the messages they sent.
+
+    Both queues are bounded: once `max_inflight` batches are being predicted
+    the batching thread waits, and once `max_pending` messages are queued
+    `submit` waits up to `submit_timeout` seconds for room and then drops the
+    message, so the MQTT network loop is never parked past its keepalive.
+    """
+    def __init__(self, predict_fn, publish_fn, executor=None, max_rows=BATCH_MAX_ROWS,
+                 max_delay=BATCH_MAX_DELAY, max_pending=INTAKE_QUEUE_SIZE, max_inflight=1,
+                 submit_timeout=INTAKE_TIMEOUT):
+        self.predict_fn = predict_fn
+        self.publish_fn = publish_fn
+        self.executor = executor
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.submit_timeout = submit_timeout
+        self.dropped = 0  # Messages dropped because the intake queue stayed full
+        self._message_ids = itertools.count()
+        self._inflight = queue.Queue(maxsize=max_inflight)
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._collector = threading.Thread(target=self._collect, name="result-collector", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._collector.start()
+
+    def submit(self, records):
+        """Queue the records of one message for the next batch and return its message id.
+        When the queue stays full for `submit_timeout` seconds the message is dropped and
+        an error result is published for it instead."""
+        message_id = next(self._message_ids)
+        try:
+            self.queue.put_nowait((message_id, records))
+            return message_id
+        except queue.Full:
+            pass
+        try:
+            self.queue.put((message_id, records), timeout=self.submit_timeout)
+        except queue.Full:
+            self.dropped += 1
+            print(f"Intake queue full ({self.queue.maxsize} messages) for {self.submit_timeout}s, "
+                  f"dropped message {message_id} of {len(records)} records ({self.dropped} dropped so far)")
+            self._publish({"message_id": message_id, "error": "dropped: intake queue full",
+                           "records": len(records), "dropped": self.dropped})
+        return message_id
+
+    def _publish(self, results):
+        try:
+            self.publish_fn(results)  # Send results to MQTT broker
+        except Exception as e:
+            print(f"Error sending results: {e}")
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            rows = len(batch[0][1])
+            deadline = time.monotonic() + self.max_delay
+            while rows < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    message = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(message)
+                rows += len(message[1])
+            future = self._dispatch([records for _, records in batch])
+            self._inflight.put((batch, future))
+
+    def _dispatch(self, messages):
+        """Start predicting the rows of `messages` and return a future holding the predictions."""
+        try:
+            if self.executor is not None:
+                return self.executor.submit(self.predict_fn, messages)
+            predictions = self.predict_fn(messages)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+        future = Future()
+        future.set_result(predictions)
+        return future
+
+    def _collect(self):
+        while True:
+            batch, future = self._inflight.get()
+            try:
+                predictions = future.result()
+            except Exception as e:
+                # One malformed message must not sink the rest of the batch: retry message by message
+                print(f"Error processing batch of {len(batch)} message(s): {e}")
+                for message_id, records in batch:
+                    try:
+                        predictions = self._dispatch([records]).result()
+                    except Exception as e:
+                        print(f"Error processing message {message_id}: {e}")
+                        self._publish({"message_id": message_id, "error": str(e)})
+                        continue
+                    self._publish({"message_id": message_id, "predictions": predictions.tolist()})
+                continue
+            offset = 0
+            for message_id, records in batch:
+                self._publish({"message_id": message_id,
+                               "predictions": predictions[offset:offset + len(records)].tolist()})
+                offset += len(records)
 
 # MQTT Handlers
+def on_connect(client, userdata, flags, rc, *args):
+    # (Re)subscribe and tell publishers which payload formats this backend decodes
+    client.subscribe(LOGS_TOPIC)
+    client.publish(CAPABILITIES_TOPIC, json.dumps({"formats": SUPPORTED_FORMATS}), qos=1, retain=True)
+
 def on_message(client, userdata, message):
     try:
+        if is_columnar(message.payload):
+            userdata.submit(decode(message.payload))  # Feature matrix straight from the payload
+            return
         # Ensure that the payload is in JSON format
         payload = json.loads(message.payload)
         # Check that the payload is a list of dictionaries or data that can be converted to a DataFrame
         if isinstance(payload, list):
-            df = pd.DataFrame(payload)
-            # Process the data and make predictions
-            df = df[IMPORTANT_FEATURES]  # Select the relevant features
-            predictions = normalize_and_predict(df)
-            results = {"predictions": predictions.tolist()}
-            send_to_mqtt(results)  # Send results to MQTT broker
+            userdata.submit(payload)  # Predicted with the next micro-batch
         else:
             print(f"Unexpected data format: {type(payload)}")
     except Exception as e:
@@ -77,10 +271,22 @@ def on_message(client, userdata, message):
 
 def run_mqtt_listener():
     """Run MQTT listener to process logs."""
-    client = mqtt.Client()
+    if PREDICT_WORKERS > 0:
+        # Each worker loads the model once; spawn keeps the children clear of this process's threads
+        executor = ProcessPoolExecutor(max_workers=PREDICT_WORKERS, initializer=load_model,
+                                       mp_context=multiprocessing.get_context("spawn"))
+        max_inflight = 2 * PREDICT_WORKERS
+    else:
+        load_model()
+        executor = None
+        max_inflight = 1
+    get_publisher()  # Connect the result publisher up front
+    batcher = MicroBatcher(predict_messages, send_to_mqtt, executor=executor, max_inflight=max_inflight)
+    batcher.start()
+    client = mqtt.Client(userdata=batcher)
+    client.on_connect = on_connect
     client.on_message = on_message
-    client.connect(BROKER, 1883, 60)
-    client.subscribe(LOGS_TOPIC)
+    client.connect(BROKER, 1883, MQTT_KEEPALIVE)
     client.loop_forever()
 
 if __name__ == '__main__':
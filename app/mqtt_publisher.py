@@ -0,0 +1,103 @@
+"""Long-lived MQTT publisher shared by the backend (app/main.py) and the data adapter.
+
+The data adapter image copies this file next to adapter.py (see data-adapter/Dockerfile),
+so reconnect, backoff and flow control stay the same on both sides.
+"""
+import os
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+# Publisher settings (QoS, paho in-flight window and queue bound, stats period in seconds)
+MQTT_QOS = int(os.environ.get("AI4TRIAGE_MQTT_QOS", 1))
+MQTT_MAX_INFLIGHT = int(os.environ.get("AI4TRIAGE_MQTT_MAX_INFLIGHT", 100))
+MQTT_MAX_QUEUED = int(os.environ.get("AI4TRIAGE_MQTT_MAX_QUEUED", 0))
+MQTT_STATS_INTERVAL = float(os.environ.get("AI4TRIAGE_MQTT_STATS_INTERVAL", 60))
+
+
+class MQTTPublisher:
+    """Long-lived MQTT publisher running on paho's background network loop.
+
+    The connection is opened once and re-established automatically by paho;
+    messages published while disconnected are queued (QoS > 0) and sent on
+    reconnect. At most `max_inflight` messages are unacknowledged at a time and
+    at most `max_queued` wait behind them (0 means unbounded). Publish latency
+    (publish call to broker acknowledgement) and queue depth are reported every
+    `stats_interval` seconds.
+    """
+    def __init__(self, broker, port=1883, qos=MQTT_QOS, max_inflight=MQTT_MAX_INFLIGHT,
+                 max_queued=MQTT_MAX_QUEUED, stats_interval=MQTT_STATS_INTERVAL):
+        self.qos = qos
+        self.stats_interval = stats_interval
+        self._lock = threading.RLock()
+        self._drained = threading.Condition(self._lock)
+        self._pending = {}  # mid -> time of the publish call
+        self._acked_early = {}  # mid -> ack time, for acks that beat publish() back to the caller
+        self.published = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._last_report = time.monotonic()
+
+        self.client = mqtt.Client()
+        self.client.max_inflight_messages_set(max_inflight)
+        self.client.max_queued_messages_set(max_queued)
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+        self.client.on_publish = self._on_publish
+        self.client.connect_async(broker, port, 60)
+        self.client.loop_start()
+
+    def publish(self, topic, payload):
+        # paho invokes on_publish while holding its own outgoing-message lock, so
+        # our lock is never held across client.publish() to avoid a lock-order deadlock
+        sent_at = time.monotonic()
+        info = self.client.publish(topic, payload, qos=self.qos)
+        if info.rc == mqtt.MQTT_ERR_SUCCESS or info.rc == mqtt.MQTT_ERR_NO_CONN and self.qos > 0:
+            with self._lock:
+                acked_at = self._acked_early.pop(info.mid, None)
+                if acked_at is None:
+                    self._pending[info.mid] = sent_at
+                else:
+                    self._record(acked_at - sent_at)
+        else:
+            print(f"Publish to {topic} failed: {mqtt.error_string(info.rc)}")
+        return info
+
+    def _on_publish(self, client, userdata, mid, *args):
+        with self._lock:
+            sent_at = self._pending.pop(mid, None)
+            if sent_at is None:
+                self._acked_early[mid] = time.monotonic()
+            else:
+                self._record(time.monotonic() - sent_at)
+
+    def _record(self, latency):
+        self.published += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        if not self._pending:
+            self._drained.notify_all()
+        if time.monotonic() - self._last_report >= self.stats_interval:
+            self._last_report = time.monotonic()
+            print(f"MQTT publisher stats: {self.stats()}")
+
+    def stats(self):
+        """Return publish counters, latency in milliseconds and the current queue depth."""
+        with self._lock:
+            avg = self.total_latency / self.published if self.published else 0.0
+            return {
+                "published": self.published,
+                "queue_depth": len(self._pending),
+                "avg_latency_ms": round(avg * 1000, 3),
+                "max_latency_ms": round(self.max_latency * 1000, 3),
+            }
+
+    def flush(self, timeout=None):
+        """Wait until every queued message has been acknowledged. Returns False on timeout."""
+        with self._drained:
+            return self._drained.wait_for(lambda: not self._pending, timeout)
+
+    def close(self, timeout=10):
+        self.flush(timeout)
+        self.client.disconnect()
+        self.client.loop_stop()
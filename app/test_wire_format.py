@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+from wire_format import decode, encode, is_columnar
+
+
+def test_dataframe_round_trip():
+    # The data adapter encodes its feature frame exactly like this
+    df = pd.DataFrame({"bytes": [1, 2, 3], "port": [443.0, np.nan, 80.0], "duration": [0.5, 1.25, 2.0]})
+    payload = encode(df.columns, df.to_numpy(dtype=np.float32))
+    assert is_columnar(payload)
+    block = decode(payload)
+    assert block.columns == list(df.columns)
+    assert len(block) == 3
+    np.testing.assert_array_equal(block.select(["duration", "bytes"]), df[["duration", "bytes"]].to_numpy(np.float32))
+    np.testing.assert_array_equal(block.matrix, df.to_numpy(np.float32))
+
+
+def test_json_is_not_columnar():
+    assert not is_columnar(b'[{"bytes": 1}]')
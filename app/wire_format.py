@@ -0,0 +1,59 @@
+"""Columnar wire format for the ai4triage/logs topic.
+
+A columnar payload is the 8-byte magic, the little-endian uint32 length of a
+JSON header {"columns": [...], "rows": n, "dtype": "<f4"}, then the values as
+one contiguous block, column after column. JSON lists of records stay
+accepted: a payload is columnar exactly when it starts with the magic.
+
+The backend advertises the formats it decodes as a retained message on
+CAPABILITIES_TOPIC; publishers fall back to JSON when it is absent.
+"""
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"AI4TCOL1"
+FORMAT_NAME = "columnar-f32"
+CAPABILITIES_TOPIC = "ai4triage/capabilities"
+SUPPORTED_FORMATS = [FORMAT_NAME, "json"]
+
+
+class ColumnarBlock:
+    """Decoded columnar payload: column names and a (rows, columns) matrix viewing the payload buffer."""
+
+    def __init__(self, columns, matrix):
+        self.columns = columns
+        self.matrix = matrix
+        self.column_index = {column: i for i, column in enumerate(columns)}
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def select(self, features):
+        """Return the (rows, len(features)) matrix of `features`, in that order."""
+        missing = [f for f in features if f not in self.column_index]
+        if missing:
+            raise ValueError(f"Missing features: {missing}")
+        return self.matrix[:, [self.column_index[f] for f in features]]
+
+
+def is_columnar(payload):
+    return payload[:len(MAGIC)] == MAGIC
+
+
+def encode(columns, matrix):
+    """Encode a (rows, columns) numeric matrix as a columnar payload."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    header = json.dumps({"columns": list(columns), "rows": matrix.shape[0], "dtype": matrix.dtype.str}).encode("utf-8")
+    return MAGIC + struct.pack("<I", len(header)) + header + matrix.tobytes(order="F")
+
+
+def decode(payload):
+    """Decode a columnar payload without copying its values."""
+    (length,) = struct.unpack_from("<I", payload, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(payload[start:start + length])
+    columns, rows = header["columns"], header["rows"]
+    values = np.frombuffer(payload, dtype=header["dtype"], count=rows * len(columns), offset=start + length)
+    return ColumnarBlock(columns, values.reshape(len(columns), rows).T)
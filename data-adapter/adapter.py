@@ -1,12 +1,22 @@
 import sys
+import os
+import threading
+import numpy as np
 import pandas as pd
 import paho.mqtt.client as mqtt
 import json
+# Modules shared with the backend: copied next to this file in the image, read from app/ otherwise
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+from mqtt_publisher import MQTTPublisher
+import wire_format
 
 # MQTT Configuration
 BROKER = "localhost"
 TOPIC = "ai4triage/logs"
 FEATURES_FILE = '/top_features.csv'
+# Payload format: "auto" (columnar when the backend advertises it), "json" or "columnar-f32"
+WIRE_FORMAT = os.environ.get("AI4TRIAGE_WIRE_FORMAT", "auto")
+CAPABILITIES_TIMEOUT = float(os.environ.get("AI4TRIAGE_CAPABILITIES_TIMEOUT", 2))
 
 def select_features(features_file):
     try:
@@ -31,19 +41,60 @@ def process_log(file_path):
             raise ValueError(f"Missing features: {', '.join(missing_features)}")
         
         # Select important features
-        important_features = df[IMPORTANT_FEATURES]
-        return important_features.to_dict(orient='records')
+        return df[IMPORTANT_FEATURES]
     except Exception as e:
         print(f"Error processing log file: {e}")
         sys.exit(1)
 
-def send_to_mqtt(data):
-    """Send processed log data to MQTT broker."""
+_publisher = None
+
+def get_publisher():
+    """Return the process-wide publisher, connecting it on first use."""
+    global _publisher
+    if _publisher is None:
+        _publisher = MQTTPublisher(BROKER)
+    return _publisher
+
+def negotiate_wire_format(timeout=CAPABILITIES_TIMEOUT):
+    """Return the payload format to send: WIRE_FORMAT, or for "auto" the columnar format if the backend advertises it."""
+    if WIRE_FORMAT != "auto":
+        return WIRE_FORMAT
+    formats = []
+    received = threading.Event()
+
+    def on_message(client, userdata, message):
+        try:
+            formats.extend(json.loads(message.payload).get("formats", []))
+        except Exception as e:
+            print(f"Ignoring malformed capabilities message: {e}")
+        received.set()
+
+    client = mqtt.Client()
+    client.on_message = on_message
     try:
-        client = mqtt.Client()
         client.connect(BROKER, 1883, 60)
-        client.publish(TOPIC, json.dumps(data))
+        client.subscribe(wire_format.CAPABILITIES_TOPIC)  # Retained by the backend
+        client.loop_start()
+        received.wait(timeout)
+        client.loop_stop()
         client.disconnect()
+    except Exception as e:
+        print(f"Error reading backend capabilities: {e}")
+    return wire_format.FORMAT_NAME if wire_format.FORMAT_NAME in formats else "json"
+
+def encode_payload(df, fmt="json"):
+    """Encode the feature frame as a columnar float32 block or as a JSON list of records."""
+    if fmt == wire_format.FORMAT_NAME:
+        try:
+            return wire_format.encode(df.columns, df.to_numpy(dtype=np.float32))
+        except (TypeError, ValueError) as e:
+            print(f"Features are not all numeric ({e}), sending JSON instead")
+    return json.dumps(df.to_dict(orient='records'))
+
+def send_to_mqtt(data):
+    """Send an encoded log payload to MQTT broker."""
+    try:
+        get_publisher().publish(TOPIC, data)
     except Exception as e:
         print(f"Error sending data to MQTT: {e}")
 
@@ -52,4 +103,5 @@ if __name__ == '__main__':
     
     file_path = "sample_log.csv"  # Replace with actual log file path
     log_data = process_log(file_path)
-    send_to_mqtt(log_data)
+    send_to_mqtt(encode_payload(log_data, negotiate_wire_format()))
+    get_publisher().close()
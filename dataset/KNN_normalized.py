@@ -1,10 +1,11 @@
 import sys
-import pandas as pd
 from sklearn.model_selection import train_test_split, GridSearchCV
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.metrics import classification_report, accuracy_score, f1_score, precision_score, recall_score
 import joblib
 import json
+from ann_knn import HNSWKNeighborsClassifier, neighbour_recall
+from frame_io import read_frame
 
 
 # Load configuration
@@ -16,6 +17,8 @@ knn_config = config.get("KNN_normalized", {})
 n_neighbors = knn_config.get("n_neighbors", 5)  # Default to 5
 weights = knn_config.get("weights", "uniform")  # Default to "uniform"
 metric = knn_config.get("metric", "euclidean")  # Default to "euclidean"
+backend = knn_config.get("backend", "exact")  # "exact" (sklearn) or "hnsw" (approximate, needs hnswlib)
+ann_params = knn_config.get("ann", {})
 param_grid = knn_config.get("param_grid", {
     "n_neighbors": [3, 5, 7, 9],
     "weights": ["uniform", "distance"],
@@ -25,9 +28,9 @@ param_grid = knn_config.get("param_grid", {
 
 def load_preprocessed_data(file_path, label_column):
     """
-    Load preprocessed data from a CSV file and handle missing values.
+    Load preprocessed data from a CSV, Parquet or Feather file and handle missing values.
     """
-    data = pd.read_csv(file_path)
+    data = read_frame(file_path)
     print(f"Loaded preprocessed dataset: {len(data)} rows")
 
     # Handle missing values
@@ -71,15 +74,44 @@ def update_config_file(config_path, best_params):
     print(f"🔹 Updated {config_path} with best parameters: {best_params}")
 
 
-def train_knn_model(X_train, y_train, n_neighbors=5, metric="euclidean", weights="uniform"):
+def train_knn_model(X_train, y_train, n_neighbors=5, metric="euclidean", weights="uniform",
+                    backend="exact", ann_params=None):
     """
     Train a KNN model with the given parameters.
+    With backend="hnsw" an approximate HNSW index is built instead of the exact sklearn model;
+    ann_params holds its M / ef_construction / ef_search settings. An hnsw model can only be
+    used with classify_logs.py: the backend (app/main.py) and export_model.py only load
+    exact KNeighborsClassifier models.
     """
-    knn_model = KNeighborsClassifier(n_neighbors=n_neighbors, metric=metric, weights=weights, n_jobs=-1)
+    if backend == "hnsw":
+        print("🔹 The hnsw model can only be used with classify_logs.py, not served by app/main.py")
+        ann_params = {k: v for k, v in (ann_params or {}).items() if k in ("M", "ef_construction", "ef_search")}
+        knn_model = HNSWKNeighborsClassifier(n_neighbors=n_neighbors, metric=metric, weights=weights,
+                                             n_jobs=-1, **ann_params)
+    elif backend == "exact":
+        knn_model = KNeighborsClassifier(n_neighbors=n_neighbors, metric=metric, weights=weights, n_jobs=-1)
+    else:
+        raise ValueError(f"Unknown KNN backend '{backend}', expected 'exact' or 'hnsw'")
     knn_model.fit(X_train, y_train)
     return knn_model
 
 
+def report_ann_recall(ann_model, X_train, y_train, X_test, sample_size=1000):
+    """
+    Compare the approximate model with an exact KNN trained on the same data, using the metric
+    the approximate index was built with, so that only the approximation error is measured.
+    """
+    metric = ann_model.effective_metric_
+    exact_model = train_knn_model(X_train, y_train, n_neighbors=ann_model.n_neighbors,
+                                  metric=metric, weights=ann_model.weights)
+    recall, agreement = neighbour_recall(ann_model, exact_model, X_test, sample_size=sample_size)
+    print("\n=== Approximate vs Exact KNN ===")
+    print(f"Metric : {metric}" + (f" (configured: {ann_model.metric})" if metric != ann_model.metric else ""))
+    print(f"Neighbour recall@{ann_model.n_neighbors} : {recall:.4f}")
+    print(f"Prediction agreement : {agreement:.4f}")
+    return recall, agreement
+
+
 def evaluate_model(model, X_test, y_test):
     """
     Evaluate the model on the test set.
@@ -101,15 +133,17 @@ def evaluate_model(model, X_test, y_test):
 def save_model(model, model_path="knn_model.joblib"):
     """
     Save the trained model for later use.
+    The dump is left uncompressed so its arrays (training matrix, labels, tree) can be
+    memory-mapped with joblib.load(model_path, mmap_mode="r") and shared between processes.
     """
-    joblib.dump(model, model_path)
+    joblib.dump(model, model_path, compress=0)
     print(f"KNN model saved as {model_path}")
 
 
 # Main script execution
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python KNN_normalized.py <preprocessed_csv_file>")
+        print("Usage: python KNN_normalized.py <preprocessed_file>")
         sys.exit(1)
 
     file_path = sys.argv[1]
@@ -130,11 +164,15 @@ if __name__ == "__main__":
         X_train, y_train,
         n_neighbors=best_params["n_neighbors"],
         metric=best_params["metric"],
-        weights=best_params["weights"]
+        weights=best_params["weights"],
+        backend=backend,
+        ann_params=ann_params
     )
 
     # Step 5: Evaluate model
     evaluate_model(knn_model, X_test, y_test)
+    if backend != "exact":
+        report_ann_recall(knn_model, X_train, y_train, X_test, sample_size=ann_params.get("recall_sample", 1000))
 
     # Step 6: Save model
     save_model(knn_model)
@@ -0,0 +1,113 @@
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+
+try:
+    import hnswlib
+except ImportError:  # Optional dependency, only needed for the "hnsw" backend
+    hnswlib = None
+
+# sklearn metric name -> hnswlib space
+HNSW_SPACES = {"euclidean": "l2", "l2": "l2", "cosine": "cosine"}
+# hnswlib space -> sklearn metric computing the same distances
+SPACE_METRICS = {"l2": "euclidean", "cosine": "cosine"}
+
+
+class HNSWKNeighborsClassifier(ClassifierMixin, BaseEstimator):
+    """
+    Approximate k-nearest-neighbours classifier backed by an HNSW graph (hnswlib).
+    Exposes the same fit/predict/predict_proba/kneighbors surface as KNeighborsClassifier.
+    """
+
+    def __init__(self, n_neighbors=5, weights="uniform", metric="euclidean",
+                 M=16, ef_construction=200, ef_search=64, random_state=42, n_jobs=-1):
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.metric = metric
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y):
+        """
+        Build the HNSW index over the training matrix.
+        """
+        if hnswlib is None:
+            raise ImportError("The 'hnsw' KNN backend requires hnswlib (pip install hnswlib)")
+        if self.weights not in ("uniform", "distance"):
+            raise ValueError(f"Unsupported weights '{self.weights}', expected 'uniform' or 'distance'")
+        space = HNSW_SPACES.get(self.metric)
+        if space is None:
+            # hnswlib only implements l2/ip/cosine; the recall report shows what this costs
+            print(f"🔹 Metric '{self.metric}' is not supported by hnswlib, using euclidean (l2) instead.")
+            space = "l2"
+        self.space_ = space
+        self.effective_metric_ = SPACE_METRICS[space]  # Like KNeighborsClassifier.effective_metric_
+
+        if hasattr(X, "columns"):
+            self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        self.classes_, self._y = np.unique(np.asarray(y), return_inverse=True)
+        self.n_features_in_ = X.shape[1]
+        self.n_samples_fit_ = X.shape[0]
+
+        self.index_ = hnswlib.Index(space=space, dim=X.shape[1])
+        self.index_.init_index(max_elements=X.shape[0], ef_construction=self.ef_construction,
+                               M=self.M, random_seed=self.random_state)
+        self.index_.add_items(X, np.arange(X.shape[0]), num_threads=self.n_jobs)
+        self.index_.set_ef(max(self.ef_search, self.n_neighbors))
+        return self
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        """
+        Find the (approximate) nearest training samples of each row of X.
+        """
+        n_neighbors = n_neighbors or self.n_neighbors
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if n_neighbors > self.index_.ef:
+            self.index_.set_ef(n_neighbors)
+        ind, dist = self.index_.knn_query(X, k=n_neighbors, num_threads=self.n_jobs)
+        ind = ind.astype(np.intp)
+        if not return_distance:
+            return ind
+        if self.space_ == "l2":
+            dist = np.sqrt(np.maximum(dist, 0))  # hnswlib returns squared euclidean distances
+        return dist, ind
+
+    def predict_proba(self, X):
+        dist, ind = self.kneighbors(X)
+        if self.weights == "distance":
+            # Same convention as sklearn: exact matches take all the weight
+            with np.errstate(divide="ignore"):
+                weights = 1.0 / dist
+            exact = np.isinf(weights).any(axis=1)
+            weights[exact] = np.isinf(weights[exact])
+        else:
+            weights = np.ones_like(dist)
+
+        proba = np.zeros((ind.shape[0], len(self.classes_)))
+        rows = np.repeat(np.arange(ind.shape[0]), ind.shape[1])
+        np.add.at(proba, (rows, self._y[ind].ravel()), weights.ravel())
+        proba /= proba.sum(axis=1, keepdims=True)
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def neighbour_recall(ann_model, exact_model, X, sample_size=1000, random_state=42):
+    """
+    Compare an approximate model with the exact KNN on (a sample of) X.
+    Returns the mean recall@k of the neighbour sets and the prediction agreement rate.
+    """
+    if sample_size and len(X) > sample_size:
+        rows = np.random.default_rng(random_state).choice(len(X), size=sample_size, replace=False)
+        X = X.iloc[rows] if hasattr(X, "iloc") else np.asarray(X)[rows]
+    k = ann_model.n_neighbors
+    ann_ind = ann_model.kneighbors(X, n_neighbors=k, return_distance=False)
+    exact_ind = exact_model.kneighbors(X, n_neighbors=k, return_distance=False)
+    hits = sum(len(np.intersect1d(a, e, assume_unique=True)) for a, e in zip(ann_ind, exact_ind))
+    recall = hits / (len(X) * k)
+    agreement = float(np.mean(ann_model.predict(X) == exact_model.predict(X)))
+    return recall, agreement
@@ -1,33 +1,107 @@
-import sys
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import joblib
 
-def main():
-    if len(sys.argv) != 4:
-        print("Usage: python classify_logs.py <input_csv> <output_csv> <model_file>")
-        sys.exit(1)
+# Model of this (worker) process, loaded once by load_model()
+model = None
 
-    input_csv = sys.argv[1]
-    output_csv = sys.argv[2]
-    model_file = sys.argv[3]
 
-    # Load processed data
-    df = pd.read_csv(input_csv)
+def load_model(model_file):
+    global model
+    # Memory-mapped so that worker processes share the model's arrays
+    model = joblib.load(model_file, mmap_mode='r')
 
-    # Load the trained model
-    model = joblib.load(model_file)
 
+def predict(df):
+    """Predict the attack label of each row of df."""
     # Drop label column if present (since we want to predict it)
     X = df.drop(columns=['attack_label'], errors='ignore')
     X = X.fillna(0)
+    return model.predict(X)
+
+
+def classify_file(input_csv, output_csv):
+    # Load processed data
+    df = pd.read_csv(input_csv)
 
     # Predict
-    predictions = model.predict(X)
-    df['predicted_label'] = predictions
+    df['predicted_label'] = predict(df)
 
     # Save results
     df.to_csv(output_csv, index=False)
-    print(f"Classification complete. Results saved to {output_csv}")
+
+
+def float_columns(input_csv, chunksize):
+    """Columns read as floats in some chunk, which pd.read_csv of the whole file reads as floats throughout."""
+    columns = set()
+    for chunk in pd.read_csv(input_csv, chunksize=chunksize):
+        columns.update(chunk.select_dtypes(include='floating').columns)
+    return columns
+
+
+def classify_stream(input_csv, output_csv, model_file, chunksize, workers=1):
+    """
+    Classify input_csv chunk by chunk, appending each chunk to output_csv in input order.
+    With workers > 1, chunks are predicted in a process pool while at most 2 * workers
+    chunks are held in memory. Columns are written with the dtypes of a whole-file read,
+    so that the output is the same as classify_file's.
+    """
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=load_model, initargs=(model_file,))
+    pending = deque()
+    total_rows = 0
+    header = True
+    floats = float_columns(input_csv, chunksize)
+
+    def write_oldest():
+        nonlocal header, total_rows
+        chunk, predictions = pending.popleft()
+        chunk['predicted_label'] = predictions.result() if executor else predictions
+        chunk.to_csv(output_csv, index=False, header=header, mode='w' if header else 'a')
+        header = False
+        total_rows += len(chunk)
+        print(f"Classified {total_rows} rows")
+
+    try:
+        for chunk in pd.read_csv(input_csv, chunksize=chunksize):
+            # An integer column with missing values in another chunk: write 1.0 rather than 1
+            chunk = chunk.astype({col: 'float64' for col in floats if pd.api.types.is_integer_dtype(chunk[col])})
+            pending.append((chunk, executor.submit(predict, chunk) if executor else predict(chunk)))
+            if len(pending) >= 2 * workers:
+                write_oldest()
+        while pending:
+            write_oldest()
+    finally:
+        if executor:
+            executor.shutdown()
+    if header:
+        # Empty input: still produce the header
+        pd.read_csv(input_csv, nrows=0).assign(predicted_label=None).to_csv(output_csv, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Classify processed logs with a trained model.')
+    parser.add_argument('input_csv')
+    parser.add_argument('output_csv')
+    parser.add_argument('model_file')
+    parser.add_argument('--chunksize', type=int, default=0,
+                        help='Stream the input in chunks of this many rows (default: read the whole file)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes predicting chunks in parallel when streaming (default: 1)')
+    args = parser.parse_args()
+
+    if args.chunksize > 0:
+        if args.workers <= 1:
+            load_model(args.model_file)
+        classify_stream(args.input_csv, args.output_csv, args.model_file, args.chunksize, args.workers)
+    else:
+        # Load the trained model
+        load_model(args.model_file)
+        classify_file(args.input_csv, args.output_csv)
+    print(f"Classification complete. Results saved to {args.output_csv}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,42 @@
+import os
+import sys
+import argparse
+import pandas as pd
+import joblib
+
+# The artifact format lives with the backend service that loads it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+from inference_artifact import write_artifact
+
+
+def load_features(features_file):
+    """
+    Read the ordered feature list from the "Feature" column of a features CSV.
+    """
+    features_df = pd.read_csv(features_file)
+    if 'Feature' not in features_df.columns:
+        raise ValueError(f"'Feature' column not found in {features_file}")
+    return features_df['Feature'].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the trained KNN model, scaler and feature list as one inference artifact.')
+    parser.add_argument('model_file', help='Trained model (e.g. knn_model.joblib)')
+    parser.add_argument('scaler_file', help='Fitted scaler (e.g. scaler.pkl)')
+    parser.add_argument('features_file', help='Features CSV with a "Feature" column (e.g. top_features.csv)')
+    parser.add_argument('output_file', help='Artifact to write (e.g. knn_model.ai4t)')
+    parser.add_argument('--version', default=None, help='Version string stored in the artifact (default: current timestamp)')
+    args = parser.parse_args()
+
+    model = joblib.load(args.model_file)
+    scaler = joblib.load(args.scaler_file)
+    features = load_features(args.features_file)
+
+    header = write_artifact(args.output_file, model, scaler, features, version=args.version)
+    n_samples, n_features = header["arrays"]["fit_X"]["shape"]
+    print(f"Inference artifact {header['version']} saved to {args.output_file} "
+          f"({n_samples} samples x {n_features} features, {len(header['classes'])} classes)")
+
+
+if __name__ == "__main__":
+    main()
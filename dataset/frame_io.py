@@ -0,0 +1,235 @@
+"""
+Reading and writing the intermediate DataFrames passed between the Datasets/ pipeline stages
+(cleaned, labelled, processed and merged logs).
+
+The format follows the file extension:
+  .csv                  CSV, always available
+  .parquet              Parquet, one row group per written chunk (needs pyarrow)
+  .feather, .arrow      Arrow IPC file, one record batch per written chunk (needs pyarrow)
+Columnar files keep the column types, so later stages skip CSV parsing and type inference,
+and can read a subset of the columns. Raw exports stay CSV.
+"""
+import os
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency, only CSV is available without it
+    pa = None
+
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".feather": "feather", ".arrow": "feather"}
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+COMPRESSION = "zstd"
+
+
+def frame_format(path):
+    """Format of a file from its extension; unknown extensions are read as CSV."""
+    return FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def is_frame_file(path):
+    """True when path has the extension of a supported format."""
+    return os.path.splitext(path)[1].lower() in FORMATS
+
+
+def with_format(path, fmt):
+    """path with its extension replaced by the one of format fmt."""
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown frame format '{fmt}', expected one of {sorted(EXTENSIONS)}")
+    return os.path.splitext(path)[0] + EXTENSIONS[fmt]
+
+
+def _require_pyarrow(path):
+    if pa is None:
+        raise ImportError(f"pyarrow is required to read or write {path}; install it or use a .csv file")
+
+
+def frame_columns(path, **csv_kwargs):
+    """Column names of a file, without reading its rows."""
+    fmt = frame_format(path)
+    if fmt == "csv":
+        return list(pd.read_csv(path, nrows=0, **csv_kwargs).columns)
+    _require_pyarrow(path)
+    if fmt == "parquet":
+        return pq.read_schema(path).names
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema.names
+
+
+def iter_frames(path, chunksize=100000, columns=None, fmt=None, **csv_kwargs):
+    """
+    Yield the rows of a file as DataFrames of at most chunksize rows, optionally only the
+    given columns. fmt overrides the format of the extension. Extra keyword arguments are
+    passed to pd.read_csv for CSV files.
+    """
+    fmt = fmt or frame_format(path)
+    if fmt == "csv":
+        csv_kwargs.setdefault("low_memory", False)
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=columns, **csv_kwargs)
+        return
+    _require_pyarrow(path)
+    if fmt == "parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            table = pa.Table.from_batches([reader.get_batch(i)])
+            if columns is not None:
+                table = table.select(columns)
+            for batch in table.to_batches(max_chunksize=chunksize):
+                yield batch.to_pandas()
+
+
+def read_frame(path, columns=None, **csv_kwargs):
+    """Read a whole file, optionally only the given columns."""
+    fmt = frame_format(path)
+    if fmt == "csv":
+        csv_kwargs.setdefault("low_memory", False)
+        return pd.read_csv(path, usecols=columns, **csv_kwargs)
+    _require_pyarrow(path)
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_feather(path, columns=columns)
+
+
+def _is_text(arrow_type):
+    return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+
+def _as_text(value):
+    return value if isinstance(value, str) or pd.isna(value) else str(value)
+
+
+def _arrow_column(column, arrow_type=None):
+    """
+    A Series as an Arrow array, of arrow_type when given. Values that are not strings are
+    converted with str() for a string type, or when the Series mixes Python types.
+    """
+    if arrow_type is not None and _is_text(arrow_type):
+        return pa.array(column.map(_as_text), type=arrow_type, from_pandas=True)
+    try:
+        array = pa.array(column, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return _arrow_column(column, arrow_type or pa.string())
+    return array if arrow_type is None or array.type == arrow_type else array.cast(arrow_type)
+
+
+def _unify_types(old, new):
+    """Arrow type holding the values of both types: int -> float64, null -> the other, mixed -> string."""
+    if old == new or pa.types.is_null(new):
+        return old
+    if pa.types.is_null(old):
+        return new
+    if pa.types.is_integer(old) and pa.types.is_integer(new):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in (old, new)):
+        return pa.float64()
+    if _is_text(old):
+        return old
+    return new if _is_text(new) else pa.string()
+
+
+class FrameWriter:
+    """
+    Writes DataFrames with the same columns to one file, chunk by chunk.
+    The first chunk fixes the columns; later chunks are reindexed to them, and cast to
+    `dtypes` ({column: dtype}) when given. For columnar formats the column types are widened
+    when a later chunk needs it (see _unify_types), rewriting the rows already written. fmt overrides
+    the format of the extension, e.g. for temporary files. With append=True a CSV file is
+    extended (its header is only written when the file is empty); columnar files cannot be
+    extended and are always rewritten.
+    """
+
+    def __init__(self, path, fmt=None, header=True, append=False, dtypes=None, compression=COMPRESSION):
+        self.path = path
+        self.format = fmt or frame_format(path)
+        self.header = header
+        self.dtypes = dtypes or {}
+        self.compression = compression
+        self.columns = None
+        self.rows = 0
+        self._writer = None
+        if self.format == "csv":
+            self._file = open(path, "a" if append else "w", newline="")
+            self.header = header and self._file.tell() == 0
+        else:
+            _require_pyarrow(path)
+            self._file = None
+            self._schema = None
+
+    def write(self, frame):
+        if self.columns is None:
+            self.columns = list(frame.columns)
+        elif list(frame.columns) != self.columns:
+            frame = frame.reindex(columns=self.columns)
+        if self.dtypes:
+            frame = frame.astype({col: dtype for col, dtype in self.dtypes.items() if col in frame.columns})
+        if self.format == "csv":
+            frame.to_csv(self._file, index=False, header=self.header and self.rows == 0)
+        else:
+            self._write_table(frame)
+        self.rows += len(frame)
+
+    def _write_table(self, frame):
+        arrays = [_arrow_column(frame[col]) for col in frame.columns]
+        if self._writer is None:
+            self._open(pa.schema([pa.field(col, array.type) for col, array in zip(frame.columns, arrays)]))
+        else:
+            schema = pa.schema([pa.field(field.name, _unify_types(field.type, array.type))
+                                for field, array in zip(self._schema, arrays)])
+            if not schema.equals(self._schema):
+                self._promote(schema)
+            arrays = [array if array.type == field.type else _arrow_column(frame[field.name], field.type)
+                      for field, array in zip(self._schema, arrays)]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def _open(self, schema):
+        self._schema = schema
+        if self.format == "parquet":
+            self._writer = pq.ParquetWriter(self.path, schema, compression=self.compression)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = pa.ipc.new_file(self.path, schema, options=options)
+
+    def _promote(self, schema):
+        """Rewrite the rows written so far with the wider schema."""
+        self._writer.close()
+        previous = self.path + ".promote"
+        os.replace(self.path, previous)
+        self._open(schema)
+        for frame in iter_frames(previous, fmt=self.format):
+            arrays = [_arrow_column(frame[field.name], field.type) for field in schema]
+            self._writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        os.remove(previous)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        elif self.format != "csv" and self._schema is None:
+            # Nothing written: leave a valid file with the known columns, if any
+            self._write_table(pd.DataFrame(columns=self.columns or [], dtype=object))
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_frame(frame, path, **csv_kwargs):
+    """Write a whole DataFrame. Extra keyword arguments are passed to to_csv for CSV files."""
+    if frame_format(path) == "csv":
+        frame.to_csv(path, index=False, **csv_kwargs)
+        return
+    with FrameWriter(path) as writer:
+        writer.write(frame)
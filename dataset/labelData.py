@@ -1,12 +1,20 @@
+import io
 import os
 import sys
 import glob
 import json
+import heapq
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import logging
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from dateutil import parser  # flexible date parser
+from dateutil import tz
 from typing import Dict, Any, List
+from frame_io import FORMATS, FrameWriter, frame_format, is_frame_file, iter_frames
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +33,7 @@ def load_config(config_path: str = 'dataset/config.json') -> Dict[str, Any]:
     """Load configuration and return a config dictionary.
        Expected keys include:
          "known_ranges": either a dict (preferred) or a list of [start, end] items,
+         "overlap_policy": how overlapping ranges are resolved (see AttackIntervalIndex, default "first"),
          "time_column": dict mapping log types to their time column (index or name),
          "time_formats": dict mapping log types to a list (or single string) of time format(s).
     """
@@ -51,12 +60,26 @@ def load_config(config_path: str = 'dataset/config.json') -> Dict[str, Any]:
             raise LabelingError(f"Invalid time range for attack {attack}: {e}")
         config["known_ranges"][attack] = (start, end)
 
+    config["interval_index"] = AttackIntervalIndex(config["known_ranges"], config.get("overlap_policy", "first"))
+    for first, second in config["interval_index"].overlaps:
+        logging.warning(f"Attack ranges {first} and {second} overlap; "
+                        f"resolved with overlap_policy '{config['interval_index'].overlap_policy}'")
+
     if "time_column" not in config:
         raise LabelingError("Missing 'time_column' in config file")
     if "time_formats" not in config:
         config["time_formats"] = {}
     return config
 
+def get_time_formats(log_type: str, config: Dict[str, Any]) -> List[str]:
+    """Return the list of time formats configured for a log type (possibly empty)."""
+    fmt_entry = config.get("time_formats", {}).get(log_type, None)
+    if isinstance(fmt_entry, str):
+        return [fmt_entry] if fmt_entry.strip() != "" else []
+    if isinstance(fmt_entry, list):
+        return fmt_entry
+    return []
+
 def convert_eventdate(log_type: str, eventdate_str: str, config: Dict[str, Any]) -> float:
     """Convert eventdate string to Unix epoch (float), except for proxy logs which are assumed numeric."""
     if log_type.lower() == "proxy":
@@ -66,16 +89,7 @@ def convert_eventdate(log_type: str, eventdate_str: str, config: Dict[str, Any])
             raise ValueError(f"Error converting proxy eventdate '{eventdate_str}' to numeric value: {e}")
     
     # For all other log types, try to use any specified time formats.
-    time_formats = config.get("time_formats", {})
-    fmt_entry = time_formats.get(log_type, None)
-    formats = []
-    if fmt_entry:
-        if isinstance(fmt_entry, str):
-            if fmt_entry.strip() != "":
-                formats = [fmt_entry]
-        elif isinstance(fmt_entry, list):
-            formats = fmt_entry
-    for fmt in formats:
+    for fmt in get_time_formats(log_type, config):
         try:
             dt_obj = datetime.strptime(eventdate_str, fmt)
             return dt_obj.timestamp()
@@ -87,81 +101,272 @@ def convert_eventdate(log_type: str, eventdate_str: str, config: Dict[str, Any])
     except Exception as e:
         raise ValueError(f"Error converting eventdate '{eventdate_str}' for log_type '{log_type}': {e}")
 
+def convert_eventdates(log_type: str, values: pd.Series, config: Dict[str, Any]) -> pd.Series:
+    """Vectorized convert_eventdate for a column of one log type.
+       Each configured time format is applied in a single to_datetime call to the rows
+       not parsed yet; only rows that match no format go through convert_eventdate one by one.
+       Rows that cannot be converted at all are returned as NaN.
+    """
+    strings = values.astype(str)
+    if log_type == "proxy":
+        result = pd.to_numeric(strings, errors="coerce").astype(float)
+        failed = result.isna() & (strings.str.lower() != "nan")
+        # to_numeric only locates the numbers; astype(float) parses them exactly like float()
+        result[~failed] = strings[~failed].astype(float)
+    else:
+        result = pd.Series(np.nan, index=values.index)
+        failed = pd.Series(True, index=values.index)
+        for fmt in get_time_formats(log_type, config):
+            if not failed.any():
+                break
+            pending = strings[failed]
+            aware = "%z" in fmt
+            parsed = pd.to_datetime(pending, format=fmt, errors="coerce", utc=aware).dropna()
+            if parsed.empty:
+                continue
+            if aware:
+                micros = (parsed - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(microseconds=1)
+                seconds = micros / 1e6
+            else:
+                # Naive times are local time, as for datetime.timestamp()
+                parsed = parsed.dt.tz_localize(tz.tzlocal(), ambiguous=np.ones(len(parsed), dtype=bool),
+                                               nonexistent="shift_forward")
+                micros = (parsed - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(microseconds=1)
+                seconds = micros // 10**6 + (micros % 10**6) / 1e6
+            result[seconds.index] = seconds
+            failed[seconds.index] = False
+
+    # Per-row fallback (dateutil) for values no format could parse
+    for idx in failed[failed].index:
+        try:
+            result[idx] = convert_eventdate(log_type, strings[idx], config)
+        except Exception as e:
+            logging.warning(f"Row skipped due to error: {e}")
+    return result
+
+class AttackIntervalIndex:
+    """Index over the known attack ranges, built once by load_config.
+       The sorted distinct range boundaries split the time line into boundary points and the
+       open gaps between them. Each piece is labelled once, at build time, so a lookup is a
+       binary search whatever the number of ranges.
+       Where ranges overlap, overlap_policy picks the winner:
+         "first"        first covering range in known_ranges order (default)
+         "narrowest"    shortest covering range, i.e. the most specific campaign
+         "latest_start" covering range that started last
+       Remaining ties go to the first range in known_ranges order.
+    """
+    OVERLAP_POLICIES = ("first", "narrowest", "latest_start")
+
+    def __init__(self, known_ranges: Dict[str, Any], overlap_policy: str = "first"):
+        if overlap_policy not in self.OVERLAP_POLICIES:
+            raise LabelingError(f"Unknown overlap_policy '{overlap_policy}', expected one of {self.OVERLAP_POLICIES}")
+        self.overlap_policy = overlap_policy
+        labels = []
+        for attack in known_ranges:
+            try:
+                labels.append(int(attack))
+            except ValueError:
+                labels.append(attack)
+        # Trailing 0 so that range id -1 (no covering range) maps to the benign label
+        self.labels = np.array(labels + [0])
+        ranges = [(float(start), float(end)) for start, end in known_ranges.values()]
+        self.overlaps = self._find_overlaps(list(known_ranges), ranges)
+        self.bounds = np.unique([b for time_range in ranges for b in time_range]).astype(float)
+        self.point_ids, self.gap_ids = self._sweep(ranges)
+
+    def _priority(self, i: int, start: float, end: float) -> tuple:
+        if self.overlap_policy == "narrowest":
+            return (end - start, i)
+        if self.overlap_policy == "latest_start":
+            return (-start, i)
+        return (i,)
+
+    def _sweep(self, ranges: List[tuple]) -> tuple:
+        """Label every boundary point and gap with the id of its winning range, in O(R log R).
+           Ranges are pushed on a heap ordered by policy priority when the sweep reaches their
+           start and dropped lazily once the sweep has passed their end.
+        """
+        n = len(self.bounds)
+        point_ids = np.full(n + 1, -1, dtype=np.int64)
+        gap_ids = np.full(n + 1, -1, dtype=np.int64)
+        order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+        active = []
+        nxt = 0
+        for k, b in enumerate(self.bounds):
+            while nxt < len(order) and ranges[order[nxt]][0] <= b:
+                i = order[nxt]
+                heapq.heappush(active, (self._priority(i, *ranges[i]), i))
+                nxt += 1
+            # Boundary point b: covered by ranges with end >= b
+            while active and ranges[active[0][1]][1] < b:
+                heapq.heappop(active)
+            if active:
+                point_ids[k] = active[0][1]
+            # Gap (b, next bound): covered by ranges with end > b
+            while active and ranges[active[0][1]][1] <= b:
+                heapq.heappop(active)
+            if active:
+                gap_ids[k + 1] = active[0][1]
+        return point_ids, gap_ids
+
+    @staticmethod
+    def _find_overlaps(names: List[str], ranges: List[tuple]) -> List[tuple]:
+        """Return (attack, attack) pairs whose range overlaps the furthest-reaching earlier range."""
+        overlaps = []
+        reach = None
+        for i in sorted(range(len(ranges)), key=lambda i: ranges[i]):
+            start, end = ranges[i]
+            if reach is not None and start <= ranges[reach][1]:
+                overlaps.append((names[reach], names[i]))
+            if reach is None or end > ranges[reach][1]:
+                reach = i
+        return overlaps
+
+    def lookup(self, timestamps: Any) -> np.ndarray:
+        """Label a whole array (or Series) of timestamps by binary search."""
+        ts = np.asarray(timestamps, dtype=float)
+        if len(self.bounds) == 0:
+            return np.zeros(len(ts), dtype=int)
+        pos = np.searchsorted(self.bounds, ts, side="left")
+        on_bound = (pos < len(self.bounds)) & (self.bounds[np.minimum(pos, len(self.bounds) - 1)] == ts)
+        return self.labels[np.where(on_bound, self.point_ids[pos], self.gap_ids[pos])]
+
+    def label(self, timestamp: float) -> Any:
+        """Label of a single timestamp."""
+        return self.lookup([timestamp])[0].item()
+
 def assign_attack_label(log_type: str, timestamp: float, config: Dict[str, Any]) -> Any:
     """Assigns an attack label by comparing timestamp to known ranges."""
     try:
-        ranges = config["known_ranges"]
-        for attack, (start, end) in ranges.items():
-            if start <= timestamp <= end:
-                try:
-                    return int(attack)
-                except ValueError:
-                    return attack
-        return 0
+        index = config.get("interval_index")
+        if index is None:
+            index = AttackIntervalIndex(config["known_ranges"], config.get("overlap_policy", "first"))
+        return index.label(timestamp)
     except Exception as e:
         logging.error(f"Error assigning label for log_type '{log_type}' and timestamp {timestamp}: {e}")
         return 0
 
 def validate_input(input_path: str) -> List[str]:
-    """Validate input path and return list of CSV files."""
+    """Validate input path and return list of CSV, Parquet or Feather files (see frame_io.py)."""
     if not os.path.exists(input_path):
         raise LabelingError(f"Input path does not exist: {input_path}")
     if os.path.isfile(input_path):
-        if not input_path.lower().endswith('.csv'):
-            raise LabelingError(f"Input file must be CSV: {input_path}")
+        if not is_frame_file(input_path):
+            raise LabelingError(f"Input file must be one of {', '.join(FORMATS)}: {input_path}")
         return [input_path]
     elif os.path.isdir(input_path):
-        files = glob.glob(os.path.join(input_path, "*.csv"))
+        files = [f for f in glob.glob(os.path.join(input_path, "*")) if is_frame_file(f)]
         if not files:
-            raise LabelingError(f"No CSV files found in directory: {input_path}")
+            raise LabelingError(f"No {', '.join(FORMATS)} files found in directory: {input_path}")
         return files
     else:
         raise LabelingError(f"Invalid input path: {input_path}")
 
-def process_file(file: str, output_file: str, config: Dict[str, Any], chunksize: int = 100000) -> tuple[int, Dict[Any, int]]:
-    """Process the CSV file in chunks using pandas.
+class ByteRangeReader(io.RawIOBase):
+    """Read-only view of a CSV file: its header line followed by the bytes [start, end)."""
+
+    def __init__(self, file: str, start: int, end: int):
+        self.fp = open(file, "rb")
+        self.header = self.fp.readline()
+        self.fp.seek(start)
+        self.remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.header:
+            n = min(len(buffer), len(self.header))
+            buffer[:n] = self.header[:n]
+            self.header = self.header[n:]
+            return n
+        data = self.fp.read(min(len(buffer), self.remaining))
+        self.remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.fp.close()
+        super().close()
+
+def plan_shards(file: str, shard_size: int) -> List[tuple]:
+    """Split a CSV file into byte ranges of about shard_size bytes, each starting at a line start.
+       Assumes no quoted field spans several lines, which holds for the cleaned logs.
+    """
+    size = os.path.getsize(file)
+    with open(file, "rb") as fp:
+        fp.readline()
+        bounds = [fp.tell()]
+        offset = bounds[0] + shard_size
+        while offset < size:
+            fp.seek(offset - 1)
+            fp.readline()  # Move to the start of the next line
+            if fp.tell() >= size:
+                break
+            bounds.append(fp.tell())
+            offset = fp.tell() + shard_size
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+def merge_label_counts(total: Dict[Any, int], counts: Dict[Any, int]) -> Dict[Any, int]:
+    for label, count in counts.items():
+        total[label] = total.get(label, 0) + count
+    return total
+
+def process_file(file: str, output_file: str, config: Dict[str, Any], chunksize: int = 100000,
+                 byte_range: tuple = None) -> tuple[int, Dict[Any, int]]:
+    """Process the file in chunks using pandas.
+       With byte_range=(start, end), only the lines in that part of a CSV file are processed.
+       The output format follows the extension of output_file; CSV output is appended to.
        Returns a tuple: (number of rows processed, dictionary of label counts)
     """
     total_processed = 0
     aggregated_labels = {}
 
-    # Check if output file exists to determine header write.
-    write_header = not os.path.exists(output_file) or os.path.getsize(output_file) == 0
-    
     time_columns = config.get("time_column", {})
+    interval_index = config["interval_index"]
 
-    def process_row(row):
-        try:
-            log_type = str(row["log_type"]).lower()
+    def convert_chunk(chunk):
+        timestamps = pd.Series(np.nan, index=chunk.index)
+        log_types = chunk["log_type"].astype(str).str.lower()
+        for log_type, rows in log_types.groupby(log_types).groups.items():
             time_col = time_columns.get(log_type)
             if time_col is None:
-                raise LabelingError(f"Time column not defined for log type '{log_type}'")
+                logging.warning(f"{len(rows)} row(s) skipped: time column not defined for log type '{log_type}'")
+                continue
             # If time_col is an integer, use iloc; if it's a string, use direct indexing.
             if isinstance(time_col, int):
-                eventdate_str = row.iloc[time_col]
+                values = chunk.iloc[:, time_col].loc[rows]
+            elif time_col in chunk.columns:
+                values = chunk.loc[rows, time_col]
             else:
-                eventdate_str = row[time_col]
-            ts = convert_eventdate(log_type, str(eventdate_str), config)
-            row["timestamp"] = ts
-        except Exception as e:
-            logging.warning(f"Row skipped due to error: {e}")
-            row["timestamp"] = None
-        return row
+                logging.warning(f"{len(rows)} row(s) skipped: time column '{time_col}' not found")
+                continue
+            timestamps[rows] = convert_eventdates(log_type, values, config)
+        chunk["timestamp"] = timestamps
+        return chunk
 
+    if byte_range is None:
+        source = None
+        chunks = iter_frames(file, chunksize)
+    else:
+        source = io.BufferedReader(ByteRangeReader(file, *byte_range))
+        chunks = pd.read_csv(source, chunksize=chunksize, low_memory=False)
+    writer = None
     try:
-        for chunk in pd.read_csv(file, chunksize=chunksize,low_memory=False):
+        writer = FrameWriter(output_file, append=True)
+        for chunk in chunks:
             # Only process if 'log_type' column exists.
             if "log_type" not in chunk.columns:
                 logging.error(f"File {file} is missing required column 'log_type'")
                 continue
-            chunk = chunk.apply(process_row, axis=1)
+            chunk = convert_chunk(chunk)
             missing = chunk["timestamp"].isna().sum()
             if missing > 0:
                 logging.warning(f"{missing} row(s) in chunk skipped due to missing/invalid timestamp in {file}")
             chunk = chunk.dropna(subset=["timestamp"])
             # Assign attack labels.
-            chunk["attack_label"] = chunk.apply(
-                lambda row: assign_attack_label(str(row["log_type"]).lower(), row["timestamp"], config), axis=1)
+            chunk["attack_label"] = interval_index.lookup(chunk["timestamp"])
             # Reorder columns so that attack_label and timestamp come first.
             cols = chunk.columns.tolist()
             for col in ["attack_label", "timestamp"]:
@@ -174,24 +379,97 @@ def process_file(file: str, output_file: str, config: Dict[str, Any], chunksize:
             total_processed += processed_count
             for label, count in label_count.items():
                 aggregated_labels[label] = aggregated_labels.get(label, 0) + count
-            try:
-                chunk.to_csv(output_file, mode="a", header=write_header, index=False)
-                write_header = False  # Only write header for the first chunk.
-                logging.info(f"Processed a chunk of {processed_count} row(s) from {file}")
-            except Exception as e:
-                logging.error(f"Error writing chunk to output for {file}: {e}")
+            # A failed write aborts the file rather than dropping the chunk
+            writer.write(chunk)
+            logging.info(f"Processed a chunk of {processed_count} row(s) from {file}")
     except Exception as e:
         logging.error(f"Error processing file {file}: {e}")
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+        if source is not None:
+            source.close()
 
     return total_processed, aggregated_labels
 
+def process_files_parallel(jobs: List[tuple], config: Dict[str, Any], workers: int,
+                           shard_size: int) -> tuple[int, Dict[Any, int]]:
+    """Label (input, output) file pairs in a process pool.
+       Files larger than shard_size bytes are split into line-aligned shards, each labelled
+       into its own part file; the parts are then appended to the output in file order.
+    """
+    total_rows = 0
+    aggregated_labels = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        submitted = []
+        for in_file, out_file in jobs:
+            # Only CSV files can be split at line boundaries
+            shardable = frame_format(in_file) == "csv" and os.path.getsize(in_file) > shard_size
+            shards = plan_shards(in_file, shard_size) if shardable else [None]
+            parts = []
+            root, ext = os.path.splitext(out_file)
+            for i, byte_range in enumerate(shards):
+                part_file = out_file if byte_range is None else f"{root}.part{i}{ext}"
+                if byte_range is not None and os.path.exists(part_file):
+                    os.remove(part_file)
+                parts.append((part_file, executor.submit(process_file, in_file, part_file, config,
+                                                         byte_range=byte_range)))
+            submitted.append((in_file, out_file, parts))
+            if len(parts) > 1:
+                logging.info(f"Split {in_file} into {len(parts)} shards")
+
+        for in_file, out_file, parts in submitted:
+            try:
+                for part_file, future in parts:
+                    rows, label_counts = future.result()
+                    total_rows += rows
+                    merge_label_counts(aggregated_labels, label_counts)
+                if parts[0][0] != out_file:
+                    stitch_parts(out_file, [part_file for part_file, _ in parts])
+            except Exception as e:
+                logging.error(f"Failed processing {in_file}: {e}")
+    return total_rows, aggregated_labels
+
+def stitch_parts(output_file: str, part_files: List[str]):
+    """Append the part files to output_file in order, keeping a single header line.
+       Parts in a columnar format are rewritten chunk by chunk into a new output_file.
+    """
+    if frame_format(output_file) != "csv":
+        with FrameWriter(output_file) as writer:
+            for part_file in part_files:
+                if not os.path.exists(part_file):
+                    continue
+                for chunk in iter_frames(part_file):
+                    writer.write(chunk)
+                os.remove(part_file)
+        return
+    write_header = not os.path.exists(output_file) or os.path.getsize(output_file) == 0
+    with open(output_file, "ab") as out:
+        for part_file in part_files:
+            if not os.path.exists(part_file):
+                continue  # Shard without any labelled row
+            with open(part_file, "rb") as part:
+                header = part.readline()
+                if write_header:
+                    out.write(header)
+                    write_header = False
+                shutil.copyfileobj(part, out)
+            os.remove(part_file)
+
 def main():
+    parser = argparse.ArgumentParser(description="Label cleaned logs with the known attack ranges.")
+    parser.add_argument("input_path", help="Cleaned file or directory of cleaned files (CSV, Parquet or Feather)")
+    parser.add_argument("output_path", help="Labelled file, or directory when input_path is a directory; "
+                                            "its extension selects the output format")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes labelling files (and shards of large files) in parallel (default: 1)")
+    parser.add_argument("--shard-size", type=int, default=256,
+                        help="With --workers > 1, split files larger than this many MB into shards (default: 256)")
+    args = parser.parse_args()
     try:
-        if len(sys.argv) < 3:
-            print("Usage: python labelData.py <input_path> <output_path>")
-            sys.exit(1)
-        input_path = sys.argv[1]
-        output_path = sys.argv[2]  # This can be a file or a directory
+        input_path = args.input_path
+        output_path = args.output_path  # This can be a file or a directory
 
         config = load_config()
         files = validate_input(input_path)
@@ -203,28 +481,25 @@ def main():
         # If input_path is a directory, then treat output_path as a directory
         if os.path.isdir(input_path):
             os.makedirs(output_path, exist_ok=True)
-            for f in files:
-                basename = os.path.basename(f)
-                # Replace "cleaned" with "labelled" in the filename
-                out_file = os.path.join(output_path, basename.replace("cleaned", "labelled"))
+            # Replace "cleaned" with "labelled" in the filename
+            jobs = [(f, os.path.join(output_path, os.path.basename(f).replace("cleaned", "labelled"))) for f in files]
+        else:
+            # Input is a single file; ensure the output directory exists.
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            jobs = [(input_path, output_path)]
+
+        if args.workers > 1:
+            total_rows, aggregated_labels = process_files_parallel(jobs, config, args.workers,
+                                                                   args.shard_size * 1024 * 1024)
+        else:
+            for in_file, out_file in jobs:
                 try:
-                    rows, label_counts = process_file(f, out_file, config)
+                    rows, label_counts = process_file(in_file, out_file, config)
                     total_rows += rows
-                    for label, count in label_counts.items():
-                        aggregated_labels[label] = aggregated_labels.get(label, 0) + count
+                    merge_label_counts(aggregated_labels, label_counts)
                 except Exception as e:
-                    logging.error(f"Failed processing {f}: {e}")
+                    logging.error(f"Failed processing {in_file}: {e}")
                     continue
-        else:
-            # Input is a single file; ensure the output directory exists.
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            try:
-                rows, label_counts = process_file(input_path, output_path, config)
-                total_rows += rows
-                for label, count in label_counts.items():
-                    aggregated_labels[label] = aggregated_labels.get(label, 0) + count
-            except Exception as e:
-                logging.error(f"Failed processing {input_path}: {e}")
 
         logging.info(f"Total rows processed: {total_rows}")
         for label, count in aggregated_labels.items():
@@ -234,4 +509,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
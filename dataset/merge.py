@@ -1,41 +1,230 @@
+import os
+import heapq
+import pickle
+import tempfile
+import argparse
+import numpy as np
 import pandas as pd
-import sys
 import glob
+from frame_io import FrameWriter, frame_columns, is_frame_file, iter_frames
 
-def merge_processed_logs(input_folder, output_file):
+TIME_COLUMN = "timestamp"
+LABEL_COLUMN = "attack_label"
+
+
+class MergedSchema:
+    """
+    Columns, dtypes and fill values of the merged dataset, from the headers and scans of the inputs.
+    The label stays int64 and the timestamp (the sort key) float64. A feature that every input
+    has and stores as integers without missing values stays int64; every other feature is stored
+    as float_dtype, filled with NaN in the sources that do not have it.
+    """
+
+    def __init__(self, headers, scans, float_dtype="float64"):
+        unlabelled = [file for file, columns in headers.items() if LABEL_COLUMN not in columns]
+        if unlabelled:
+            raise ValueError(f"Missing the '{LABEL_COLUMN}' column: {', '.join(unlabelled)}")
+        self.columns = list(dict.fromkeys(col for columns in headers.values() for col in columns))
+        # Inputs without rows add no values, so they do not widen any column
+        filled = [scan for scan in scans if scan.rows]
+        integers = {col for col in self.columns
+                    if filled and all(col in scan.integer_columns for scan in filled)}
+        self.dtypes = {col: np.dtype("int64") if col == LABEL_COLUMN or (col in integers and col != TIME_COLUMN)
+                       else np.dtype("float64") if col == TIME_COLUMN
+                       else np.dtype(float_dtype) for col in self.columns}
+        self.fill_values = {col: np.nan for col in self.columns if self.dtypes[col].kind == "f"}
+        # Number of inputs with each column
+        self.sources = {col: sum(col in columns for columns in headers.values()) for col in self.columns}
+
+    def conform(self, block):
+        """block's rows in the merged columns and dtypes."""
+        data = {}
+        for col in self.columns:
+            dtype = self.dtypes[col]
+            if col not in block.columns:
+                # Only float columns can be missing from an input (see MergedSchema)
+                data[col] = np.full(len(block), self.fill_values[col], dtype=dtype)
+                continue
+            try:
+                data[col] = block[col].to_numpy(dtype=dtype)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Column '{col}' cannot be stored as {dtype}: {e}")
+        return pd.DataFrame(data, index=block.index)
+
+
+class InputScan:
+    """Row count, timestamp order and integer columns of one input, from one pass over the file."""
+
+    def __init__(self, file, chunksize, columns):
+        self.file = file
+        self.rows = 0
+        self.is_sorted = True  # Non-decreasing timestamps, missing ones only at the end
+        # Columns read as integers in every chunk, so without missing or fractional values
+        self.integer_columns = set(columns)
+        last, seen_missing = -np.inf, False
+        for chunk in iter_frames(file, chunksize):
+            self.rows += len(chunk)
+            self.integer_columns &= {col for col in chunk.columns if pd.api.types.is_integer_dtype(chunk[col])}
+            if TIME_COLUMN not in chunk.columns or not self.is_sorted:
+                continue  # Without a timestamp every row goes last, in file order
+            ts = chunk[TIME_COLUMN].to_numpy(dtype=float)
+            missing = np.isnan(ts)
+            present = ts[~missing]
+            if (seen_missing and len(present)) or (missing.any() and not missing[missing.argmax():].all()) \
+                    or (len(present) and (present[0] < last or (np.diff(present) < 0).any())):
+                self.is_sorted = False
+            if len(present):
+                last = present[-1]
+            seen_missing = seen_missing or missing.any()
+
+
+def sort_chunk(chunk):
+    """Stable sort by timestamp, missing timestamps last."""
+    if TIME_COLUMN not in chunk.columns:
+        return chunk
+    return chunk.sort_values(by=TIME_COLUMN, kind="stable", na_position="last")
+
+
+def write_run(chunk, path, block_rows):
+    """Store a sorted chunk as pickled blocks of block_rows rows."""
+    with open(path, "wb") as f:
+        for start in range(0, len(chunk), block_rows):
+            pickle.dump(chunk.iloc[start:start + block_rows], f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_run(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def time_values(block):
+    if TIME_COLUMN not in block.columns:
+        return np.full(len(block), np.nan)
+    return block[TIME_COLUMN].to_numpy(dtype=float)
+
+
+def merge_runs(runs, conform, spill):
+    """
+    Heap-driven k-way merge of sorted runs, yielding DataFrames in timestamp order. Each run is
+    a callable returning an iterator of sorted blocks, and conform() aligns a block with the
+    output schema. Equal timestamps keep the run order, then the row order; rows without a
+    timestamp come last, run by run, from the files they are set aside in under spill.
+    """
+    iterators = [iter(run()) for run in runs]
+    blocks = [None] * len(runs)
+    heap = []  # (last timestamp of the current block, run)
+    tails = {}  # run -> file of its rows without a timestamp
+
+    def load(j):
+        """Next block of run j with its timestamps, up to the first missing one (None when done)."""
+        for block in iterators[j]:
+            ts = time_values(block)
+            missing = np.isnan(ts)
+            end = int(missing.argmax()) if missing.any() else len(ts)
+            if end < len(ts):
+                # Missing timestamps are last in a sorted run: set the rest of the run aside
+                tails[j] = os.path.join(spill, f"tail_{j}.pkl")
+                with open(tails[j], "wb") as f:
+                    pickle.dump(block.iloc[end:], f, protocol=pickle.HIGHEST_PROTOCOL)
+                    for rest in iterators[j]:
+                        pickle.dump(rest, f, protocol=pickle.HIGHEST_PROTOCOL)
+            if end:
+                blocks[j] = (conform(block.iloc[:end]), ts[:end])
+                heapq.heappush(heap, (ts[end - 1], j))
+                return
+            if j in tails:
+                break
+        blocks[j] = None
+
+    for j in range(len(runs)):
+        load(j)
+    while heap:
+        last, first = heapq.heappop(heap)
+        if blocks[first] is None or blocks[first][1][-1] != last:
+            continue  # Stale entry
+        # Every later row of any run sorts after (last, first): rows up to that key are final
+        parts, exhausted = [], []
+        for j, current in enumerate(blocks):
+            if current is None:
+                continue
+            block, ts = current
+            cut = len(ts) if j == first else np.searchsorted(ts, last, side="right" if j < first else "left")
+            if cut:
+                parts.append(block.iloc[:cut])
+            if cut == len(ts):
+                exhausted.append(j)
+            elif cut:
+                blocks[j] = (block.iloc[cut:], ts[cut:])
+        if parts:
+            merged = pd.concat(parts, ignore_index=True)
+            yield merged.iloc[np.argsort(time_values(merged), kind="stable")]
+        for j in exhausted:
+            load(j)
+
+    for j in sorted(tails):
+        for block in read_run(tails[j]):
+            yield conform(block)
+
+
+def merge_processed_logs(input_folder, output_file, chunksize=100000, float_dtype="float64"):
     """
-    Merges all processed CSV files into a single dataset.
+    Merges all processed files (CSV, Parquet or Feather) into a single dataset.
     Assumes all files have a standardized structure. The merged data is sorted by
     the 'timestamp' column and then the column is removed.
+    Inputs are streamed: unsorted files are sorted in chunks spilled to disk, and the sorted
+    runs are merged, so memory is bounded by chunksize times the number of input files.
+    The merged columns and dtypes come from the file headers and scans (see MergedSchema).
     """
-    all_files = glob.glob(f"{input_folder}/*.csv")
+    all_files = sorted(file for file in glob.glob(os.path.join(input_folder, "*")) if is_frame_file(file))
     if not all_files:
-        print("No processed CSV files found in the specified folder.")
+        print("No processed CSV, Parquet or Feather files found in the specified folder.")
         return
-    
-    dataframes = [pd.read_csv(file) for file in all_files]
-    
-    # Concatenate all processed data
-    merged_data = pd.concat(dataframes, ignore_index=True)
 
-    # Sort data by timestamp (important for attack sequence detection)
-    merged_data.sort_values(by="timestamp", inplace=True)
+    headers = {file: frame_columns(file) for file in all_files}
+    scans = [InputScan(file, chunksize, headers[file]) for file in all_files]
+    schema = MergedSchema(headers, scans, float_dtype)
+    sparse = [col for col, count in schema.sources.items() if count * 2 < len(all_files)]
+    if sparse:
+        # Stored as nulls, which Parquet and Feather encode in a few bits per row
+        print(f"{len(sparse)} of {len(schema.columns)} columns are missing from most inputs: {', '.join(sparse)}")
+
+    run_count = sum(1 if scan.is_sorted else -(-scan.rows // chunksize) for scan in scans)
+    block_rows = max(1, chunksize * len(scans) // max(run_count, 1))
 
     # Remove 'timestamp' column
-    if "timestamp" in merged_data.columns:
-        merged_data = merged_data.drop("timestamp", axis=1)
+    output_columns = [col for col in schema.columns if col != TIME_COLUMN]
+    with tempfile.TemporaryDirectory(prefix=".merge-", dir=os.path.dirname(os.path.abspath(output_file))) as spill:
+        runs = []
+        for i, scan in enumerate(scans):
+            if scan.is_sorted:
+                runs.append(lambda file=scan.file: iter_frames(file, block_rows))
+                continue
+            # Sort data by timestamp (important for attack sequence detection), a chunk at a time
+            print(f"Sorting {scan.file} in chunks of {chunksize} rows")
+            for k, chunk in enumerate(iter_frames(scan.file, chunksize)):
+                path = os.path.join(spill, f"{i}_{k}.pkl")
+                write_run(sort_chunk(chunk), path, block_rows)
+                runs.append(lambda path=path: read_run(path))
 
-    # Save the merged dataset
-    merged_data.to_csv(output_file, index=False)
+        # Save the merged dataset
+        with FrameWriter(output_file) as writer:
+            for frame in merge_runs(runs, schema.conform, spill):
+                writer.write(frame[output_columns])
     print(f"Merged dataset saved to {output_file}")
 
 # Main function
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python merge.py <processed_logs_directory> <output_merged_csv>")
-        sys.exit(1)
-
-    input_folder = sys.argv[1]
-    output_file = sys.argv[2]
+    parser = argparse.ArgumentParser(description="Merge processed logs into one dataset sorted by timestamp.")
+    parser.add_argument("input_folder", help="Directory of processed CSV, Parquet or Feather files")
+    parser.add_argument("output_file", help="Merged output file; its extension selects the format")
+    parser.add_argument("--chunksize", type=int, default=100000,
+                        help="Rows per sorted chunk and per input in memory (default: 100000)")
+    parser.add_argument("--float-dtype", choices=["float64", "float32"], default="float64",
+                        help="Storage type of the non-integer feature columns; float32 halves their size but rounds the values (default: float64)")
+    args = parser.parse_args()
 
-    merge_processed_logs(input_folder, output_file)
+    merge_processed_logs(args.input_folder, args.output_file, args.chunksize, args.float_dtype)
@@ -4,6 +4,8 @@ import numpy as np
 from sklearn.preprocessing import MinMaxScaler
 import logging
 import json
+import os
+from frame_io import iter_frames, read_frame, write_frame
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logging.info("Processing started.")
@@ -78,7 +80,7 @@ def process_large_csv(input_file, output_file, chunksize=100000, undersample_lab
     processed_chunks = []
 
     # Read the CSV file in chunks
-    for chunk in pd.read_csv(input_file, chunksize=chunksize, low_memory=False):
+    for chunk in iter_frames(input_file, chunksize):
         logging.info(f"Processing a chunk of size {len(chunk)}...")
         processed_chunk = process_chunk(chunk, undersample_label, target_column)
         if not processed_chunk.empty:
@@ -88,12 +90,12 @@ def process_large_csv(input_file, output_file, chunksize=100000, undersample_lab
     if processed_chunks:
         final_data = pd.concat(processed_chunks, ignore_index=True)
 
-        # Save the processed DataFrame to CSV
-        final_data.to_csv(output_file, index=False)
+        # Save the processed DataFrame
+        write_frame(final_data, output_file)
         print(f"Processed data saved to {output_file}!")
 
         # Save metadata
-        save_metadata(final_data, output_file.replace('.csv', '_metadata.json'))
+        save_metadata(final_data, metadata_path(output_file))
     else:
         logging.warning("The entire dataset is empty after processing. No output file will be created.")
 
@@ -103,7 +105,7 @@ def clean_large_csv(input_file, cleaned_file, chunksize=100000):
     cleaned_chunks = []
 
     # Read the CSV file in chunks
-    for chunk in pd.read_csv(input_file, chunksize=chunksize, low_memory=False):
+    for chunk in iter_frames(input_file, chunksize):
         logging.info(f"Cleaning a chunk of size {len(chunk)}...")
         # Perform cleaning (without undersampling or outlier removal)
         cleaned_chunk = process_chunk(chunk, undersample_label=None, target_column=None, skip_undersample=True, skip_outliers=True)
@@ -114,8 +116,8 @@ def clean_large_csv(input_file, cleaned_file, chunksize=100000):
     if cleaned_chunks:
         final_cleaned_data = pd.concat(cleaned_chunks, ignore_index=True)
 
-        # Save the cleaned DataFrame to a new CSV file
-        final_cleaned_data.to_csv(cleaned_file, index=False)
+        # Save the cleaned DataFrame to a new file
+        write_frame(final_cleaned_data, cleaned_file)
         print(f"Cleaned data saved to {cleaned_file}!")
     else:
         logging.warning("The entire dataset is empty after cleaning. No cleaned file will be created.")
@@ -123,7 +125,7 @@ def clean_large_csv(input_file, cleaned_file, chunksize=100000):
 # Function to process the cleaned data as a whole
 def process_cleaned_csv(cleaned_file, output_file, undersample_label=0, target_column="attack_label"):
     # Read the entire cleaned file into memory
-    cleaned_data = pd.read_csv(cleaned_file, low_memory=False)
+    cleaned_data = read_frame(cleaned_file)
     logging.info(f"Processing the cleaned data with undersampling and outlier removal...")
 
     # Remove constant columns from the entire dataset
@@ -132,11 +134,11 @@ def process_cleaned_csv(cleaned_file, output_file, undersample_label=0, target_c
     # Apply undersampling and outlier removal to the entire dataset
     processed_data = process_chunk(cleaned_data, undersample_label, target_column, skip_undersample=False, skip_outliers=False)
 
-    # Save the processed data to a new CSV file
+    # Save the processed data to a new file
     if not processed_data.empty:
-        processed_data.to_csv(output_file, index=False)
+        write_frame(processed_data, output_file)
         print(f"Processed data saved to {output_file}!")
-        save_metadata(processed_data, output_file.replace('.csv', '_metadata.json'))
+        save_metadata(processed_data, metadata_path(output_file))
     else:
         logging.warning("The entire dataset is empty after processing. No output file will be created.")
 
@@ -176,6 +178,10 @@ def remove_constant_columns(data, target_column="attack_label"):
         data.drop(columns=constant_columns, inplace=True)
     return data
 
+# Metadata file stored next to a data file
+def metadata_path(data_file):
+    return os.path.splitext(data_file)[0] + '_metadata.json'
+
 # Function to save metadata
 def save_metadata(data, output_file):
     if data.empty:
@@ -199,7 +205,7 @@ def save_metadata(data, output_file):
 # Main function
 def main():
     if len(sys.argv) < 4:
-        print("Usage: python processData.py <input_csv_file> <cleaned_csv_file> <output_csv_file>")
+        print("Usage: python processData.py <input_file> <cleaned_file> <output_file>  (.csv, .parquet or .feather)")
         sys.exit(1)
     
     input_file = sys.argv[1]
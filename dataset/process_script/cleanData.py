@@ -1,11 +1,17 @@
 import os
+import copy
+import pickle
+import shutil
+import hashlib
 import pandas as pd
-import numpy as np
 import logging
 from tqdm import tqdm
 import json
 import argparse
 import sys
+from streaming_stats import RunningMoments, KLLSketch, HyperLogLog, canonical_values
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # dataset/, for frame_io
+from frame_io import FrameWriter, frame_format, iter_frames, with_format
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,8 +28,16 @@ CSV_SEPARATOR = config.get("CSV_SEPARATOR", ",")
 LOG_TYPE_MAPPING = config.get("LOG_TYPE_MAPPING", {})
 CHUNKSIZE = int(config.get("CHUNKSIZE", 100000))
 MISSING_THRESHOLD = float(config.get("MISSING_THRESHOLD", 0.95))
+INTERMEDIATE_FORMAT = config.get("INTERMEDIATE_FORMAT", "csv")  # Format of the cleaned files, see frame_io.py
 
 class GlobalStatistics:
+    """
+    Column statistics of the raw rows, built chunk by chunk from mergeable sketches:
+    exact means and standard deviations, KLL medians and HyperLogLog distinct counts.
+    finalize_statistics() turns them into missing_ratios, means, stds, median_values
+    and unique_counts. The first two distinct values of each column are kept exactly, so
+    unique_counts is exact up to 2 and constant columns are never decided by the estimate.
+    """
     def __init__(self):
         self.missing_ratios = {}
         self.means = {}
@@ -32,81 +46,105 @@ class GlobalStatistics:
         self.unique_counts = {}
         self.total_rows = 0
         self.column_dtypes = {}
+        self.columns = []  # Every column seen, in order of first appearance
+        self.text_columns = set()  # Columns read with a non-numeric dtype in some chunk
+        self.distinct = {}  # col -> HyperLogLog
+        self.first_values = {}  # col -> up to two distinct values, see canonical_values()
+        self.moments = {}  # numeric col -> RunningMoments
+        self.quantiles = {}  # numeric col -> KLLSketch
 
     def update_from_chunk(self, chunk):
-        n = len(chunk)
         if self.total_rows == 0:
-            self._initialize_from_chunk(chunk)
-        else:
-            self._update_statistics(chunk, n)
-        self.total_rows += n
-
-    def _initialize_from_chunk(self, chunk):
-        self.column_dtypes = chunk.dtypes.to_dict()
-        for col in chunk.columns:
-            self.missing_ratios[col] = chunk[col].isnull().sum()
-            self.unique_counts[col] = set(chunk[col].dropna().unique())
-            if pd.api.types.is_numeric_dtype(chunk[col]):
-                self.means[col] = chunk[col].mean()
-                self.stds[col] = chunk[col].var() * len(chunk)
-                self.median_values[col] = chunk[col].median()
-
-    def _update_statistics(self, chunk, n):
-        new_columns = set(chunk.columns) - set(self.missing_ratios.keys())
-        for col in new_columns:
-            self.missing_ratios[col] = 0
-            self.unique_counts[col] = set()
-            if pd.api.types.is_numeric_dtype(chunk[col]):
-                self.means[col] = 0
-                self.stds[col] = 0
-                self.median_values[col] = 0
+            self.column_dtypes = chunk.dtypes.to_dict()
         for col in chunk.columns:
+            if col not in self.missing_ratios:
+                self.columns.append(col)
+                self.missing_ratios[col] = 0
+                self.distinct[col] = HyperLogLog()
+                self.first_values[col] = []
             self.missing_ratios[col] += chunk[col].isnull().sum()
+            self.distinct[col].update(chunk[col])
+            if len(self.first_values[col]) < 2:
+                numbers, others = canonical_values(chunk[col])
+                self._add_first_values(col, list(pd.unique(numbers)) + list(pd.unique(others)))
             if pd.api.types.is_numeric_dtype(chunk[col]):
-                if col not in self.means:
-                    self.means[col] = chunk[col].mean()
-                    self.stds[col] = chunk[col].var() * n
-                    self.median_values[col] = chunk[col].median()
-                else:
-                    old_mean = self.means[col]
-                    chunk_mean = chunk[col].mean()
-                    delta = chunk_mean - old_mean
-                    self.means[col] = old_mean + (delta * n) / self.total_rows
-                    self.stds[col] += chunk[col].var() * (n - 1)
-                    old_median = self.median_values[col]
-                    chunk_median = chunk[col].median()
-                    self.median_values[col] = (old_median * self.total_rows + chunk_median * n) / (self.total_rows + n)
-            self.unique_counts[col].update(chunk[col].dropna().unique())
+                self.moments.setdefault(col, RunningMoments()).update(chunk[col])
+                self.quantiles.setdefault(col, KLLSketch()).update(chunk[col])
+            else:
+                self.text_columns.add(col)
+        self.total_rows += len(chunk)
+
+    def _add_first_values(self, col, values):
+        first_values = self.first_values.setdefault(col, [])
+        for value in values:
+            if len(first_values) == 2:
+                break
+            if value not in first_values:
+                first_values.append(value)
+
+    def merge(self, other):
+        """Merge the (not yet finalized) statistics of another set of rows into these."""
+        if other.total_rows == 0:
+            return self
+        if self.total_rows == 0:
+            self.__dict__.update(copy.deepcopy(other.__dict__))
+            return self
+        self.columns.extend(col for col in other.columns if col not in self.missing_ratios)
+        for col, missing in other.missing_ratios.items():
+            self.missing_ratios[col] = self.missing_ratios.get(col, 0) + missing
+            self.distinct.setdefault(col, HyperLogLog()).merge(other.distinct[col])
+            self._add_first_values(col, other.first_values[col])
+        self.text_columns |= other.text_columns
+        for col in other.moments:
+            self.moments.setdefault(col, RunningMoments()).merge(other.moments[col])
+            self.quantiles.setdefault(col, KLLSketch()).merge(other.quantiles[col])
+        for col, dtype in other.column_dtypes.items():
+            self.column_dtypes.setdefault(col, dtype)
+        self.total_rows += other.total_rows
+        return self
+
+    def finalized(self):
+        """Return a finalized copy, leaving these statistics mergeable."""
+        stats = copy.deepcopy(self)
+        stats.finalize_statistics()
+        return stats
 
     def finalize_statistics(self):
         for col in self.missing_ratios:
             self.missing_ratios[col] /= self.total_rows
-            if col in self.means:
-                self.stds[col] = np.sqrt(self.stds[col] / (self.total_rows - 1))
-            self.unique_counts[col] = len(self.unique_counts[col])
+            exact = len(self.first_values[col])
+            self.unique_counts[col] = exact if exact < 2 else max(2, round(self.distinct[col].count()))
+        for col, moments in self.moments.items():
+            self.means[col] = moments.mean
+            self.stds[col] = moments.std
+            self.median_values[col] = self.quantiles[col].quantile(0.5)
+
+def csv_files(subdir):
+    subdir_path = os.path.join(RAW_DIR, subdir)
+    return sorted(file for file in os.listdir(subdir_path) if file.endswith(".csv"))
+
+def file_statistics(file_path, chunksize=CHUNKSIZE):
+    """Statistics of one raw file, not finalized so that they can be merged with others."""
+    stats = GlobalStatistics()
+    file = os.path.basename(file_path)
+    for chunk in tqdm(pd.read_csv(file_path, chunksize=chunksize, low_memory=False, sep=CSV_SEPARATOR), desc=f"Cleaning {file}"):
+        try:
+            stats.update_from_chunk(chunk)
+        except Exception as e:
+            logging.warning(f"Error cleaning chunk in {file}: {str(e)}")
+            continue
+    return stats
 
 def first_pass(subdir, chunksize=CHUNKSIZE):
     logging.info(f"Starting first pass for {subdir}: Computing global statistics...")
     stats = GlobalStatistics()
-    subdir_path = os.path.join(RAW_DIR, subdir)
-    for file in os.listdir(subdir_path):
-        if file.endswith(".csv"):
-            file_path = os.path.join(subdir_path, file)
-            for chunk in tqdm(pd.read_csv(file_path, chunksize=chunksize, low_memory=False, sep=CSV_SEPARATOR), desc=f"Cleaning {file}"):
-                try:
-                    stats.update_from_chunk(chunk)
-                except Exception as e:
-                    logging.warning(f"Error cleaning chunk in {file}: {str(e)}")
-                    continue
+    for file in csv_files(subdir):
+        stats.merge(file_statistics(os.path.join(RAW_DIR, subdir, file), chunksize))
     stats.finalize_statistics()
     logging.info("First pass completed: Global statistics computed")
     return stats
 
-def second_pass(subdir, stats, chunksize=CHUNKSIZE, missing_threshold=MISSING_THRESHOLD):
-    logging.info(f"Starting second pass for {subdir}: Applying transformations...")
-    log_type = LOG_TYPE_MAPPING.get(subdir, "unknown")
-    logging.info(f"Cleaning log type: {log_type}")
-
+def columns_to_remove(stats, missing_threshold=MISSING_THRESHOLD):
     constant_cols = set(col for col, unique_count in stats.unique_counts.items() if unique_count <= 1)
     high_missing_cols = set(col for col, ratio in stats.missing_ratios.items() if ratio > missing_threshold)
     cols_to_remove = constant_cols.union(high_missing_cols)
@@ -115,78 +153,289 @@ def second_pass(subdir, stats, chunksize=CHUNKSIZE, missing_threshold=MISSING_TH
     if high_missing_cols:
         logging.info(f"Columns to remove due to high missing rate: {sorted(high_missing_cols)}")
     logging.info(f"Total unique columns to remove: {sorted(cols_to_remove)}")
+    return cols_to_remove
 
-    cleaned_chunks = []
-    subdir_path = os.path.join(RAW_DIR, subdir)
-    for file in os.listdir(subdir_path):
-        if file.endswith(".csv"):
-            file_path = os.path.join(subdir_path, file)
-            for chunk in tqdm(pd.read_csv(file_path, chunksize=chunksize, low_memory=False, sep=CSV_SEPARATOR), desc=f"cleaning {file}"):
-                chunk = chunk.drop(columns=cols_to_remove, errors='ignore')
-                chunk['log_type'] = log_type
-
-                # Use the timestamp column as specified in config.json
-                timestamp_col = config.get("time_column", {}).get(log_type)
-                if not timestamp_col:
-                    logging.warning(f"No timestamp column specified for log type '{log_type}'. Please add it to config.json under 'time_column'.")
-                else:
-                    if timestamp_col not in chunk.columns:
-                        logging.warning(f"Timestamp column '{timestamp_col}' not found in file for log type '{log_type}'.")
-
-                # Fill missing values in numeric columns
-                numeric_columns = chunk.select_dtypes(include=['number']).columns
-                for col in numeric_columns:
-                    if col in stats.median_values:
-                        chunk[col] = chunk[col].fillna(stats.median_values[col])
-
-                # Log-type-specific filtering (optional, can be extended)
-                if log_type == "firewall":
-                    if "type" in chunk.columns:
-                        chunk["type"] = chunk["type"].str.lower()
-                        chunk = chunk[chunk["type"] == "threat"]
-                elif log_type == "proxy":
-                    if "action" in chunk.columns:
-                        chunk["action"] = chunk["action"].str.lower()
-                        chunk = chunk[chunk["action"] != "allow"]
-                elif log_type == "xdr":
-                    if "_table" in chunk.columns:
-                        chunk["_table"] = chunk["_table"].astype(str)
-                        chunk = chunk[chunk["_table"].str.strip() != ""]
-                elif log_type == "mail":
-                    if "evento" in chunk.columns:
-                        mail_filter_evento = chunk["evento"].str.contains("message", case=False, na=False)
-                    else:
-                        mail_filter_evento = True
-                    if "tls.verify" in chunk.columns:
-                        mail_filter_tls = chunk["tls.verify"].astype(str).str.strip() != "OK"
-                    else:
-                        mail_filter_tls = True
-                    chunk = chunk[mail_filter_evento | mail_filter_tls]
-
-                if not chunk.empty:
-                    cleaned_chunks.append(chunk)
-
-    if cleaned_chunks:
-        final_data = pd.concat(cleaned_chunks, ignore_index=True)
-        cols = list(final_data.columns)
-        if 'log_type' in cols:
-            cols.remove('log_type')
-            final_data = final_data[['log_type'] + cols]
-        return final_data
+def clean_chunk(chunk, stats, cols_to_remove, log_type):
+    chunk = chunk.drop(columns=cols_to_remove, errors='ignore')
+    chunk['log_type'] = log_type
+
+    # Use the timestamp column as specified in config.json
+    timestamp_col = config.get("time_column", {}).get(log_type)
+    if not timestamp_col:
+        logging.warning(f"No timestamp column specified for log type '{log_type}'. Please add it to config.json under 'time_column'.")
     else:
+        if timestamp_col not in chunk.columns:
+            logging.warning(f"Timestamp column '{timestamp_col}' not found in file for log type '{log_type}'.")
+
+    # Fill missing values in numeric columns
+    numeric_columns = chunk.select_dtypes(include=['number']).columns
+    for col in numeric_columns:
+        if col in stats.median_values:
+            chunk[col] = chunk[col].fillna(stats.median_values[col])
+
+    # Log-type-specific filtering (optional, can be extended)
+    if log_type == "firewall":
+        if "type" in chunk.columns:
+            chunk["type"] = chunk["type"].str.lower()
+            chunk = chunk[chunk["type"] == "threat"]
+    elif log_type == "proxy":
+        if "action" in chunk.columns:
+            chunk["action"] = chunk["action"].str.lower()
+            chunk = chunk[chunk["action"] != "allow"]
+    elif log_type == "xdr":
+        if "_table" in chunk.columns:
+            chunk["_table"] = chunk["_table"].astype(str)
+            chunk = chunk[chunk["_table"].str.strip() != ""]
+    elif log_type == "mail":
+        if "evento" in chunk.columns:
+            mail_filter_evento = chunk["evento"].str.contains("message", case=False, na=False)
+        else:
+            mail_filter_evento = True
+        if "tls.verify" in chunk.columns:
+            mail_filter_tls = chunk["tls.verify"].astype(str).str.strip() != "OK"
+        else:
+            mail_filter_tls = True
+        chunk = chunk[mail_filter_evento | mail_filter_tls]
+    return chunk
+
+def output_columns(stats, cols_to_remove):
+    """Column schema of the cleaned output, fixed after the first pass: log_type, then the kept raw columns."""
+    return ['log_type'] + [col for col in stats.columns if col not in cols_to_remove and col != 'log_type']
+
+def output_dtypes(stats, columns):
+    """
+    Column types of columnar output, so that every chunk has the same schema: float for the
+    columns that were numeric in every chunk, string for the others.
+    """
+    return {col: "float64" if col in stats.moments and col not in stats.text_columns else "string"
+            for col in columns}
+
+def cleaned_path(log_type):
+    return with_format(os.path.join(CLEANED_DIR, f"{log_type}_cleaned"), INTERMEDIATE_FORMAT)
+
+def open_writer(path, fmt, stats, columns, header=True):
+    """FrameWriter for cleaned rows in format fmt; columnar formats get the output_dtypes schema."""
+    dtypes = output_dtypes(stats, columns) if fmt != "csv" else None
+    return FrameWriter(path, fmt=fmt, header=header, dtypes=dtypes)
+
+def write_cleaned_rows(file_path, writer, stats, cols_to_remove, columns, log_type, chunksize=CHUNKSIZE):
+    """Clean a raw file chunk by chunk, writing the rows in the `columns` schema with writer. Returns the row count."""
+    rows = 0
+    for chunk in tqdm(pd.read_csv(file_path, chunksize=chunksize, low_memory=False, sep=CSV_SEPARATOR),
+                      desc=f"cleaning {os.path.basename(file_path)}"):
+        chunk = clean_chunk(chunk, stats, cols_to_remove, log_type)
+        if not chunk.empty:
+            writer.write(chunk.reindex(columns=columns))
+            rows += len(chunk)
+    return rows
+
+def second_pass(subdir, stats, output_path, chunksize=CHUNKSIZE, missing_threshold=MISSING_THRESHOLD):
+    """Clean every raw file of subdir straight into output_path, one chunk in memory at a time."""
+    logging.info(f"Starting second pass for {subdir}: Applying transformations...")
+    log_type = LOG_TYPE_MAPPING.get(subdir, "unknown")
+    logging.info(f"Cleaning log type: {log_type}")
+    cols_to_remove = columns_to_remove(stats, missing_threshold)
+    columns = output_columns(stats, cols_to_remove)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    rows = 0
+    with open_writer(output_path + ".tmp", frame_format(output_path), stats, columns) as writer:
+        for file in csv_files(subdir):
+            file_path = os.path.join(RAW_DIR, subdir, file)
+            rows += write_cleaned_rows(file_path, writer, stats, cols_to_remove, columns, log_type, chunksize)
+    if rows == 0:
+        os.remove(output_path + ".tmp")
         logging.warning("No data remained after cleaning")
-        return pd.DataFrame()
+    else:
+        os.replace(output_path + ".tmp", output_path)
+        logging.info(f"Data saved to {output_path}")
+    return rows
+
+# Incremental mode: per-file statistics and cleaned parts are kept under STATE_DIR with a
+# manifest, so that a run only reads new or changed files and resumes after a crash.
+STATE_DIR = os.path.join(CLEANED_DIR, ".state")
+STATE_VERSION = 5  # Bump when the saved statistics or parts change format
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(state_dir):
+    """Return the {file: entry} manifest of a state directory, empty if missing or outdated."""
+    manifest_path = os.path.join(state_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r") as f:
+        state = json.load(f)
+    if state.get("version") != STATE_VERSION:
+        logging.info(f"Discarding incremental state in {state_dir} from an older version")
+        return {}
+    return state["files"]
+
+def save_manifest(state_dir, manifest):
+    """Write the manifest atomically, so that a crash leaves the previous version intact."""
+    manifest_path = os.path.join(state_dir, "manifest.json")
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump({"version": STATE_VERSION, "files": manifest}, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def is_unchanged(entry, file_path):
+    """Compare a raw file with its manifest entry: size and mtime, then content hash."""
+    if entry is None or "sha256" not in entry:
+        return False
+    st = os.stat(file_path)
+    if st.st_size != entry["size"]:
+        return False
+    if st.st_mtime == entry["mtime"]:
+        return True
+    if file_sha256(file_path) == entry["sha256"]:
+        entry["mtime"] = st.st_mtime  # Touched but identical
+        return True
+    return False
+
+def transform_signature(file_stats, stats, cols_to_remove, columns, log_type):
+    """
+    Hash of everything the second pass applies to one file: the output schema, the removed
+    columns it has and the medians filled into its numeric columns with missing values.
+    The cleaned part of a file only needs rewriting when this changes.
+    """
+    filled = {col: float(stats.median_values[col]) for col in sorted(file_stats.missing_ratios)
+              if col in stats.median_values and file_stats.missing_ratios[col] > 0}
+    signature = {
+        "log_type": log_type,
+        "columns": columns,
+        "time_column": config.get("time_column", {}).get(log_type),
+        "removed": sorted(set(cols_to_remove) & set(file_stats.missing_ratios)),
+        "medians": filled,
+    }
+    return hashlib.sha256(json.dumps(signature, sort_keys=True, default=str).encode("utf-8")).hexdigest()
 
-def save_data(data, output_dir, filename):
-    os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, filename)
-    data.to_csv(output_path, index=False)
+def clean_file(file_path, part_path, stats, cols_to_remove, columns, log_type, chunksize=CHUNKSIZE):
+    """
+    Clean one raw file into its part file (written to a temporary file, then renamed).
+    CSV parts are headerless; columnar parts have the output_dtypes schema.
+    """
+    with open_writer(part_path + ".tmp", frame_format(part_path), stats, columns, header=False) as writer:
+        write_cleaned_rows(file_path, writer, stats, cols_to_remove, columns, log_type, chunksize)
+    os.replace(part_path + ".tmp", part_path)
+
+def assemble_parts(part_paths, output_path, columns):
+    """
+    Concatenate the parts, which all share the `columns` schema, into the output file:
+    CSV parts byte for byte after a header, columnar parts chunk by chunk.
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    if frame_format(output_path) == "csv":
+        part_paths = [path for path in part_paths if os.path.getsize(path) > 0]
+        rows = len(part_paths)
+        if part_paths:
+            with open(output_path + ".tmp", "w", newline="") as out:
+                pd.DataFrame(columns=columns).to_csv(out, index=False)
+            with open(output_path + ".tmp", "ab") as out:
+                for path in part_paths:
+                    with open(path, "rb") as part:
+                        shutil.copyfileobj(part, out)
+    else:
+        with FrameWriter(output_path + ".tmp", fmt=frame_format(output_path)) as writer:
+            for path in part_paths:
+                for frame in iter_frames(path, CHUNKSIZE):
+                    writer.write(frame)
+        rows = writer.rows
+    if not rows:
+        if os.path.exists(output_path + ".tmp"):
+            os.remove(output_path + ".tmp")
+        logging.warning("No data remained after cleaning")
+        return False
+    os.replace(output_path + ".tmp", output_path)
     logging.info(f"Data saved to {output_path}")
+    return True
+
+def incremental_clean(subdir, chunksize=CHUNKSIZE, missing_threshold=MISSING_THRESHOLD):
+    """
+    Clean a subdirectory reusing the work of earlier runs: only new or changed raw files are
+    read for statistics, only parts whose transform signature changed are rewritten, and the
+    manifest is saved after every file so that an interrupted run resumes where it stopped.
+    """
+    log_type = LOG_TYPE_MAPPING[subdir]
+    state_dir = os.path.join(STATE_DIR, log_type)
+    os.makedirs(os.path.join(state_dir, "stats"), exist_ok=True)
+    os.makedirs(os.path.join(state_dir, "parts"), exist_ok=True)
+    manifest = load_manifest(state_dir)
+    files = csv_files(subdir)
+    output_path = cleaned_path(log_type)
+    changed = False
+
+    # Forget files that are no longer in the raw directory
+    for file in set(manifest) - set(files):
+        for path in (manifest[file].get("stats"), manifest[file].get("part")):
+            if path and os.path.exists(path):
+                os.remove(path)
+        del manifest[file]
+        changed = True
+    save_manifest(state_dir, manifest)
+
+    # First pass: statistics of new or changed files only
+    logging.info(f"Starting incremental first pass for {subdir}...")
+    file_stats = {}
+    for file in files:
+        file_path = os.path.join(RAW_DIR, subdir, file)
+        entry = manifest.get(file)
+        stats_path = os.path.join(state_dir, "stats", f"{file}.pkl")
+        if is_unchanged(entry, file_path) and os.path.exists(stats_path):
+            with open(stats_path, "rb") as f:
+                file_stats[file] = pickle.load(f)
+            continue
+        logging.info(f"Computing statistics of new or changed file {file}")
+        file_stats[file] = file_statistics(file_path, chunksize)
+        with open(stats_path + ".tmp", "wb") as f:
+            pickle.dump(file_stats[file], f)
+        os.replace(stats_path + ".tmp", stats_path)
+        st = os.stat(file_path)
+        manifest[file] = {"size": st.st_size, "mtime": st.st_mtime, "sha256": file_sha256(file_path),
+                          "stats": stats_path, "part": None, "signature": None}
+        save_manifest(state_dir, manifest)
+        changed = True
+
+    save_manifest(state_dir, manifest)
+
+    stats = GlobalStatistics()
+    for file in files:
+        stats.merge(file_stats[file])
+    stats = stats.finalized()
+    cols_to_remove = columns_to_remove(stats, missing_threshold)
+    columns = output_columns(stats, cols_to_remove)
+
+    # Second pass: rewrite only the parts whose transformation changed
+    logging.info(f"Starting incremental second pass for {subdir}...")
+    for file in files:
+        entry = manifest[file]
+        part_path = with_format(os.path.join(state_dir, "parts", file), frame_format(output_path))
+        if entry["part"] != part_path:  # New file, or the intermediate format changed
+            if entry["part"] and os.path.exists(entry["part"]):
+                os.remove(entry["part"])
+            entry["part"], entry["signature"] = part_path, None
+        signature = transform_signature(file_stats[file], stats, cols_to_remove, columns, log_type)
+        if entry["signature"] == signature and os.path.exists(entry["part"]):
+            continue
+        clean_file(os.path.join(RAW_DIR, subdir, file), entry["part"], stats, cols_to_remove, columns, log_type, chunksize)
+        entry["signature"] = signature
+        save_manifest(state_dir, manifest)
+        changed = True
+
+    if changed or not os.path.exists(output_path):
+        assemble_parts([manifest[file]["part"] for file in files], output_path, columns)
+    else:
+        logging.info(f"{output_path} is up to date")
 
 def main():
     parser = argparse.ArgumentParser(description='Clean log data with options to clean specific log types.')
     parser.add_argument('log_types', nargs='*', type=str,
                       help='Log types to clean (default: all). Options: all, firewall, mail, proxy, xdr, ...')
+    parser.add_argument('--incremental', action='store_true',
+                      help='Only process new or changed raw files, reusing the state of earlier runs')
     args = parser.parse_args()
 
     # Accept any log type present in LOG_TYPE_MAPPING
@@ -210,14 +459,14 @@ def main():
     for subdir in subdirs_to_clean:
         try:
             logging.info(f"Cleaning subdirectory: {subdir}")
-            stats = first_pass(subdir)
-            cleaned_data = second_pass(subdir, stats)
-            if not cleaned_data.empty:
-                if subdir in LOG_TYPE_MAPPING:
-                    cleaned_filename = f"{LOG_TYPE_MAPPING[subdir]}_cleaned.csv"
-                    save_data(cleaned_data, CLEANED_DIR, cleaned_filename)
-                else:
-                    logging.warning(f"Subdirectory '{subdir}' not found in LOG_TYPE_MAPPING. Skipping save.")
+            if subdir not in LOG_TYPE_MAPPING:
+                logging.warning(f"Subdirectory '{subdir}' not found in LOG_TYPE_MAPPING. Skipping.")
+                continue
+            if args.incremental:
+                incremental_clean(subdir)
+            else:
+                stats = first_pass(subdir)
+                second_pass(subdir, stats, cleaned_path(LOG_TYPE_MAPPING[subdir]))
             logging.info(f"Completed cleaning {subdir}")
         except Exception as e:
             logging.error(f"Error cleaning {subdir}: {str(e)}")
@@ -1,15 +1,23 @@
 import os
 import sys
+import time
+import pickle
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 import pandas as pd
 import numpy as np
 import logging
 from tqdm import tqdm
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
 from collections import defaultdict
 from imblearn.under_sampling import RandomUnderSampler
 from imblearn.over_sampling import SMOTE
 from imblearn.pipeline import Pipeline
 import re
+from streaming_stats import RunningMoments, KLLSketch
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # dataset/, for frame_io
+from frame_io import frame_columns, is_frame_file, iter_frames, write_frame
 
 # Configure logging
 logging.basicConfig(
@@ -23,164 +31,250 @@ logging.basicConfig(
 
 class PostLabelStatistics:
     """Class to hold statistics for labeled data processing"""
-    def __init__(self):
+    def __init__(self, iqr_threshold=1.5):
         self.means = {}
         self.stds = {}
         self.categorical_columns = set()
-        self.label_encoders = {}
+        self.vocabularies = {}  # categorical col -> distinct values, a sorted pd.Index once finalized
         self.class_distribution = defaultdict(int)
         self.total_rows = 0
-        self.scaler = MinMaxScaler(feature_range=(0, 1))  # Initialize scaler for MinMax scaling
         self.numeric_columns = set()
         self.feature_ranges = {}  # Track min/max values for features
-        
+        self.iqr_threshold = iqr_threshold
+        # Mergeable sketches shared with cleanData.py (see streaming_stats.py)
+        self.moments = {}  # numeric col -> RunningMoments
+        self.quantiles = {}  # numeric col -> KLLSketch
+        # Set by finalize_statistics(), aligned with feature_columns
+        self.feature_columns = []
+        self.lower_bounds = None
+        self.upper_bounds = None
+        self.scale_min = None
+        self.scale_range = None
+
     def update_from_chunk(self, chunk):
         """Update statistics from a new chunk"""
-        n = len(chunk)
         if self.total_rows == 0:
             self._initialize_from_chunk(chunk)
-        else:
-            self._update_statistics(chunk, n)
-        self.total_rows += n
+        self._update_statistics(chunk)
+        self.total_rows += len(chunk)
 
     def _initialize_from_chunk(self, chunk):
-        """Initialize statistics from first chunk"""
-        # Identify categorical and numeric columns
+        """Identify categorical and numeric columns from the first chunk"""
         for col in chunk.columns:
             if col != 'attack_label':  # Skip label column
                 # Try to enforce numeric conversion.
                 series = pd.to_numeric(chunk[col], errors='coerce')
                 if series.notnull().sum() > 0:
-                    self.means[col] = series.mean()
-                    # Multiply variance by count of non-null values for online updating.
-                    self.stds[col] = series.var() * series.notnull().sum()
                     self.numeric_columns.add(col)  # Track numeric columns
-                    self.feature_ranges[col] = {
-                        'min': series.min(),
-                        'max': series.max()
-                    }
+                    self.feature_columns.append(col)
+                    self.moments[col] = RunningMoments()
+                    self.quantiles[col] = KLLSketch()
                 else:
                     self.categorical_columns.add(col)
-                    self.label_encoders[col] = LabelEncoder()
-                    
-        # Update class distribution
-        labels = chunk['attack_label'].value_counts()
-        for label, count in labels.items():
-            self.class_distribution[label] += count
+                    self.vocabularies[col] = set()
 
-    def _update_statistics(self, chunk, n):
-        """Update running statistics with new chunk using enforced numeric conversion"""
-        for col in self.means.keys():
-            series = pd.to_numeric(chunk[col], errors='coerce')
-            chunk_mean = series.mean()
-            old_mean = self.means[col]
-            delta = chunk_mean - old_mean
-            # Update running mean
-            self.means[col] = old_mean + (delta * n) / self.total_rows
-            # Update running sum of variances (using non-null count)
-            self.stds[col] += series.var() * (n - 1)
-            
-        # Update min/max values for numeric columns
+    def _update_statistics(self, chunk):
+        """Update the sketches and vocabularies with a chunk using enforced numeric conversion"""
         for col in self.numeric_columns:
             if col in chunk.columns:
                 series = pd.to_numeric(chunk[col], errors='coerce')
-                current_min = series.min()
-                current_max = series.max()
-                self.feature_ranges[col]['min'] = min(self.feature_ranges[col]['min'], current_min)
-                self.feature_ranges[col]['max'] = max(self.feature_ranges[col]['max'], current_max)
-        
+                self.moments[col].update(series)
+                self.quantiles[col].update(series)
+        for col in self.categorical_columns:
+            if col in chunk.columns:
+                self.vocabularies[col].update(chunk[col].dropna().unique())
+
         # Update class distribution
         labels = chunk['attack_label'].value_counts()
         for label, count in labels.items():
             self.class_distribution[label] += count
 
     def finalize_statistics(self):
-        """Finalize statistics computation"""
-        # Compute final standard deviations using total_rows - 1 as degrees of freedom
-        for col in self.means.keys():
-            self.stds[col] = np.sqrt(self.stds[col] / (self.total_rows - 1))
-            
+        """
+        Finalize statistics computation: sorted vocabularies for encoding, and per feature column
+        the IQR outlier bounds and the min/max scaling range of the values inside them
+        """
+        for col, moments in self.moments.items():
+            self.means[col] = moments.mean
+            self.stds[col] = moments.std
+            self.feature_ranges[col] = {'min': moments.min, 'max': moments.max}
+        for col, values in self.vocabularies.items():
+            try:
+                values = sorted(values)
+            except TypeError:  # Mixed types
+                values = sorted(values, key=str)
+            self.vocabularies[col] = pd.Index(values, dtype=object)
+            logging.info(f"Column {col}: {len(values)} distinct values")
+
+        q1 = np.array([self.quantiles[col].quantile(0.25) for col in self.feature_columns])
+        q3 = np.array([self.quantiles[col].quantile(0.75) for col in self.feature_columns])
+        self.lower_bounds = q1 - self.iqr_threshold * (q3 - q1)
+        self.upper_bounds = q3 + self.iqr_threshold * (q3 - q1)
+        self.scale_min = np.maximum([self.moments[col].min for col in self.feature_columns], self.lower_bounds)
+        scale_max = np.minimum([self.moments[col].max for col in self.feature_columns], self.upper_bounds)
+        # Like MinMaxScaler, a constant column is shifted to 0 but not scaled
+        self.scale_range = np.where(scale_max > self.scale_min, scale_max - self.scale_min, 1.0)
+
         logging.info("Class distribution:")
         for label, count in self.class_distribution.items():
             logging.info(f"Label {label}: {count} samples")
 
-def first_pass(input_file: str, chunksize: int = 100000) -> PostLabelStatistics:
-    """First pass: compute statistics from labeled data"""
+def first_pass(input_file: str, chunksize: int = 100000, progress=None) -> PostLabelStatistics:
+    """First pass: compute statistics from labeled data.
+    progress(stage, rows), when given, is called per chunk instead of showing a progress bar"""
     logging.info("Starting first pass: Computing statistics...")
     stats = PostLabelStatistics()
     
-    with tqdm(desc="First pass", unit="rows") as pbar:
-        for chunk in pd.read_csv(input_file, chunksize=chunksize, low_memory=False):
+    with tqdm(desc="First pass", unit="rows", disable=progress is not None) as pbar:
+        for chunk in iter_frames(input_file, chunksize):
             stats.update_from_chunk(chunk)
             pbar.update(len(chunk))
+            if progress is not None:
+                progress("first pass", len(chunk))
     
     stats.finalize_statistics()
     logging.info("First pass completed")
     return stats
 
+class BenignReservoir:
+    """
+    Uniform random sample of at most `capacity` rows of a stream of chunks: every row gets a
+    random key and the rows with the smallest keys are kept (bottom-k sampling).
+    """
+    def __init__(self, capacity, seed=42):
+        self.capacity = capacity
+        self.rng = np.random.default_rng(seed)
+        self.rows = None
+        self.keys = np.empty(0)
+        self.seen = 0
+
+    def add(self, chunk):
+        self.seen += len(chunk)
+        keys = np.concatenate([self.keys, self.rng.random(len(chunk))])
+        rows = chunk if self.rows is None else pd.concat([self.rows, chunk], ignore_index=True)
+        if len(rows) > self.capacity:
+            keep = np.sort(np.argpartition(keys, self.capacity)[:self.capacity])
+            rows, keys = rows.iloc[keep], keys[keep]
+        self.rows, self.keys = rows.reset_index(drop=True), keys
+
+    def sample(self, n):
+        """n of the kept rows (all of them if fewer), still a uniform sample of every row seen"""
+        if self.rows is None or n >= len(self.rows):
+            return self.rows
+        return self.rows.iloc[np.sort(np.argsort(self.keys, kind="stable")[:n])]
+
+class LabelSpill:
+    """Rows of each attack label appended, chunk by chunk, to a pickle file per label in directory"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.counts = {}
+
+    def _path(self, label):
+        return os.path.join(self.directory, f"label_{label}.pkl")
+
+    def add(self, chunk):
+        for label, rows in chunk.groupby('attack_label', sort=False):
+            with open(self._path(label), "ab") as f:
+                pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self.counts[label] = self.counts.get(label, 0) + len(rows)
+
+    def load(self, label):
+        frames = []
+        with open(self._path(label), "rb") as f:
+            while True:
+                try:
+                    frames.append(pickle.load(f))
+                except EOFError:
+                    break
+        return pd.concat(frames, ignore_index=True)
+
+def transform_chunk(chunk, stats):
+    """
+    Encode, filter and scale one chunk with the finalized first-pass statistics, so that every
+    chunk gets the same codes and scale and chunks can be transformed in any order.
+    Returns the transformed chunk and the number of outliers per column.
+    """
+    # 1. Encode categorical variables with the global vocabularies (missing values get the last code)
+    for col in stats.categorical_columns:
+        if col in chunk.columns:
+            vocabulary = stats.vocabularies[col]
+            codes = vocabulary.get_indexer(chunk[col].astype(object))
+            chunk[col] = np.where(codes < 0, len(vocabulary), codes)
+
+    # 2. Remove rows outside the global IQR bounds of any numeric column
+    columns = [col for col in stats.feature_columns if col in chunk.columns]
+    positions = [stats.feature_columns.index(col) for col in columns]
+    values = chunk[columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    below = values < stats.lower_bounds[positions]
+    above = values > stats.upper_bounds[positions]
+    outliers = {col: int(count) for col, count in zip(columns, (below | above).sum(axis=0)) if count}
+    # Rows with a missing numeric value are dropped too, as no bound check passes for them
+    keep = ~(below | above | np.isnan(values)).any(axis=1)
+    chunk = chunk[keep]
+
+    # 3. Scale numeric features to [0, 1] with the global ranges
+    if columns:
+        chunk[columns] = (values[keep] - stats.scale_min[positions]) / stats.scale_range[positions]
+    return chunk, outliers
+
 def second_pass(input_file: str, output_file: str, stats: PostLabelStatistics, 
-                chunksize: int = 100000, z_threshold: float = 10.0):
-    """Second pass: apply transformations using computed statistics"""
+                chunksize: int = 100000, z_threshold: float = 10.0, progress=None) -> int:
+    """Second pass: apply transformations using computed statistics.
+    Returns the number of rows written; progress is as in first_pass"""
     logging.info("Starting second pass: Applying transformations...")
-    
-    processed_chunks = []
-    with tqdm(desc="Second pass", unit="rows") as pbar:
-        for chunk in pd.read_csv(input_file, chunksize=chunksize, low_memory=False):
-            # 1. Encode categorical variables
-            for col in stats.categorical_columns:
-                if col in chunk.columns:
-                    chunk[col] = stats.label_encoders[col].fit_transform(chunk[col])
-            
-            # 2. Remove outliers using robust IQR on numeric columns
-            iqr_threshold = 1.5  # Adjust this value as needed
-            for col in stats.numeric_columns:
-                if col in chunk.columns:
-                    series = pd.to_numeric(chunk[col], errors='coerce')
-                    Q1 = series.quantile(0.25)
-                    Q3 = series.quantile(0.75)
-                    IQR = Q3 - Q1
-                    lower_bound = Q1 - iqr_threshold * IQR
-                    upper_bound = Q3 + iqr_threshold * IQR
-                    outliers = series[(series < lower_bound) | (series > upper_bound)].count()
-                    if outliers > 0:
-                        logging.info(f"Column {col}: {outliers} outliers found outside [{lower_bound}, {upper_bound}]")
-                    chunk = chunk[(series >= lower_bound) & (series <= upper_bound)]
-
-            total_rows_after = len(chunk)
-            
-            # 3. Scale numeric features using MinMaxScaler
+
+    # The benign sample never needs more rows than the largest attack class of the first pass
+    attack_counts = {label: count for label, count in stats.class_distribution.items() if label != 0}
+    benign = BenignReservoir(max(attack_counts.values(), default=0))
+    spill_dir = tempfile.TemporaryDirectory(prefix=".spill-", dir=os.path.dirname(os.path.abspath(output_file)))
+    attacks = LabelSpill(spill_dir.name)
+    try:
+        return process_and_balance(input_file, output_file, stats, chunksize, benign, attacks, progress)
+    finally:
+        spill_dir.cleanup()
+
+def process_and_balance(input_file, output_file, stats, chunksize, benign, attacks, progress=None):
+    """Stream the transformed chunks into the benign reservoir and the attack spill, then balance"""
+    processed_rows = 0
+    outlier_counts = {}
+    with tqdm(desc="Second pass", unit="rows", disable=progress is not None) as pbar:
+        for chunk in iter_frames(input_file, chunksize):
+            rows_read = len(chunk)
+            chunk, outliers = transform_chunk(chunk, stats)
+            for col, count in outliers.items():
+                outlier_counts[col] = outlier_counts.get(col, 0) + count
             if not chunk.empty:
-                numeric_data = chunk[list(stats.numeric_columns)]
-                if not numeric_data.empty:
-                    scaled_data = stats.scaler.fit_transform(numeric_data)
-                    chunk[list(stats.numeric_columns)] = scaled_data
-                processed_chunks.append(chunk)
+                benign.add(chunk[chunk['attack_label'] == 0])
+                attacks.add(chunk[chunk['attack_label'] != 0])
+                processed_rows += len(chunk)
             
-            pbar.update(len(chunk))
-    
+            pbar.update(rows_read)
+            if progress is not None:
+                progress("second pass", rows_read)
+
+    for col, count in outlier_counts.items():
+        col_index = stats.feature_columns.index(col)
+        logging.info(f"Column {col}: {count} outliers found outside "
+                     f"[{stats.lower_bounds[col_index]}, {stats.upper_bounds[col_index]}]")
+
     # After processing all chunks
-    if not processed_chunks:
-        logging.warning("No objects to concatenate: processed_chunks is empty. Writing empty output file.")
+    if processed_rows == 0:
+        logging.warning("No rows remained after processing. Writing empty output file.")
         # Try to get columns from the input file
         try:
-            columns = pd.read_csv(input_file, nrows=0).columns
+            columns = frame_columns(input_file)
         except Exception:
             columns = []
         empty_df = pd.DataFrame(columns=columns)
-        empty_df.to_csv(output_file, index=False)
+        write_frame(empty_df, output_file)
         logging.info(f"Empty output file saved to {output_file}")
-        return
-    final_data = pd.concat(processed_chunks, ignore_index=True)
-    
-    # NEW BALANCING APPROACH:
-    logging.info("Balancing data: undersampling benign and oversampling attack classes...")
+        return 0
 
-    # Separate benign (label 0) and attack (labels 1..N) samples
-    df_benign = final_data[final_data['attack_label'] == 0]
-    df_attack = final_data[final_data['attack_label'] != 0]
+    # BALANCING: undersample benign and oversample attack classes, one attack label at a time
+    logging.info("Balancing data: undersampling benign and oversampling attack classes...")
 
     # Get counts for each attack label and determine target_count as the maximum attack label count
-    attack_counts = df_attack['attack_label'].value_counts()
+    attack_counts = pd.Series(attacks.counts, dtype=int)
     if attack_counts.empty:
         logging.error("No attack records found!")
         sys.exit("No attack records found!")
@@ -188,16 +282,15 @@ def second_pass(input_file: str, output_file: str, stats: PostLabelStatistics,
     logging.info(f"Target count for attack classes (highest attack label count): {target_count}")
 
     # Undersample benign samples to target_count if needed.
-    benign_count = len(df_benign)
-    if benign_count > target_count:
-        logging.info(f"Undersampling benign class from {benign_count} to {target_count} samples")
-        df_benign = df_benign.sample(n=target_count, random_state=42)
+    if benign.seen > target_count:
+        logging.info(f"Undersampling benign class from {benign.seen} to {target_count} samples")
+    df_benign = benign.sample(target_count)
 
     # Identify attack labels that are below target_count.
     attack_over_labels = [label for label, count in attack_counts.items() if count < target_count]
     # Pass through labels that already have enough samples.
-    df_attack_ok = df_attack[~df_attack['attack_label'].isin(attack_over_labels)]
-    df_attack_final = df_attack_ok.copy()
+    ok_labels = [label for label in attack_counts.index if label not in attack_over_labels]
+    df_attack_final = [attacks.load(label) for label in ok_labels]
 
     # For attack labels needing oversampling, split based on count:
     # Use SMOTE when count > 1; if count==1, use random oversampling.
@@ -206,7 +299,9 @@ def second_pass(input_file: str, output_file: str, stats: PostLabelStatistics,
 
     if smote_labels:
         strategy = {label: target_count for label in smote_labels}
-        df_attack_smote = df_attack[df_attack['attack_label'].isin(smote_labels)]
+        # SMOTE needs two classes; a label already at target_count is left as it is
+        fit_labels = smote_labels if len(smote_labels) > 1 else smote_labels + ok_labels[:1]
+        df_attack_smote = pd.concat([attacks.load(label) for label in fit_labels], ignore_index=True)
         X_smote = df_attack_smote.drop('attack_label', axis=1)
         y_smote = df_attack_smote['attack_label']
         min_attack_samples = min(attack_counts[label] for label in smote_labels)
@@ -217,19 +312,17 @@ def second_pass(input_file: str, output_file: str, stats: PostLabelStatistics,
         X_res, y_res = oversampler.fit_resample(X_smote, y_smote)
         df_res_smote = pd.concat([pd.DataFrame(y_res, columns=['attack_label']),
                                   pd.DataFrame(X_res, columns=X_smote.columns)], axis=1)
-        df_attack_final = pd.concat([df_attack_final, df_res_smote], ignore_index=True)
+        df_attack_final.append(df_res_smote[df_res_smote['attack_label'].isin(smote_labels)])
 
     if random_labels:
         logging.info(f"Applying random oversampling for labels with a single sample: {random_labels}")
-        df_random = pd.concat([df_attack[df_attack['attack_label'] == label]
-                               .sample(n=target_count, replace=True, random_state=42)
-                               for label in random_labels], ignore_index=True)
-        df_attack_final = pd.concat([df_attack_final, df_random], ignore_index=True)
+        df_attack_final.extend(attacks.load(label).sample(n=target_count, replace=True, random_state=42)
+                               for label in random_labels)
 
-    final_data_balanced = pd.concat([df_benign, df_attack_final], axis=0).reset_index(drop=True)
+    final_data_balanced = pd.concat([df_benign] + df_attack_final, axis=0).reset_index(drop=True)
     
     try:
-        final_data_balanced.to_csv(output_file, index=False)
+        write_frame(final_data_balanced, output_file)
         logging.info(f"Final data saved to {output_file}")
     except Exception as e:
         logging.error(f"Error writing final output: {e}")
@@ -239,14 +332,108 @@ def second_pass(input_file: str, output_file: str, stats: PostLabelStatistics,
     logging.info("Final class distribution after balancing:")
     for label, count in final_distribution.items():
         logging.info(f"Label {label}: {count} samples")
+    return len(final_data_balanced)
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python post_label_process.py <input_labeled_csv_or_dir> <output_processed_dir>")
-        sys.exit(1)
+def process_file(input_file, output_file, chunksize=100000, progress=None):
+    """Run both passes on one labelled file; returns its timing report row"""
+    start = time.perf_counter()
+    report = {"file": input_file, "output": output_file, "rows_in": 0, "rows_out": 0,
+              "first_pass_s": 0.0, "second_pass_s": 0.0, "status": "ok"}
+    try:
+        stats = first_pass(input_file, chunksize, progress=progress)
+        report["rows_in"] = stats.total_rows
+        report["first_pass_s"] = round(time.perf_counter() - start, 2)
+        report["rows_out"] = second_pass(input_file, output_file, stats, chunksize, progress=progress)
+        report["second_pass_s"] = round(time.perf_counter() - start - report["first_pass_s"], 2)
+        logging.info(f"Processed {input_file} -> {output_file}")
+    except (Exception, SystemExit) as e:  # second_pass exits when a file has no attack rows
+        logging.error(f"Error processing {input_file}: {e}")
+        report["status"] = f"failed: {e}"
+    report["total_s"] = round(time.perf_counter() - start, 2)
+    return report
 
-    input_path = sys.argv[1]
-    output_dir = sys.argv[2]
+class QueueProgress:
+    """Picklable progress callback of a worker, sending (job, stage, rows) to the main process"""
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.job = job
+
+    def __call__(self, stage, rows):
+        self.queue.put((self.job, stage, rows))
+
+def available_memory():
+    """Bytes of free physical memory, or None when it cannot be read"""
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def default_workers(input_files, memory_per_byte=2):
+    """
+    Number of files to process at once: at most one per core, and only as many as fit in the free
+    memory when each worker may need memory_per_byte times the size of the largest file
+    """
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    workers = min(len(input_files), cores)
+    memory = available_memory()
+    largest = max(os.path.getsize(f) for f in input_files)
+    if memory and largest:
+        workers = min(workers, max(1, int(memory // (memory_per_byte * largest))))
+    return max(1, workers)
+
+def process_files(jobs, workers, chunksize=100000):
+    """
+    Process (input, output) file pairs, the largest input first, in a pool of `workers`
+    processes, showing one progress bar per file. Returns the timing report rows in job order.
+    """
+    order = sorted(range(len(jobs)), key=lambda i: os.path.getsize(jobs[i][0]), reverse=True)
+    if workers <= 1:
+        return [process_file(input_file, output_file, chunksize) for input_file, output_file in jobs]
+
+    reports = [None] * len(jobs)
+    bars = {i: tqdm(desc=f"{os.path.basename(jobs[i][0])} (queued)", unit="rows", position=position)
+            for position, i in enumerate(order)}
+
+    def show_progress():
+        while not queue.empty():
+            job, stage, rows = queue.get()
+            bars[job].set_description(f"{os.path.basename(jobs[job][0])} ({stage})", refresh=False)
+            bars[job].update(rows)
+
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=workers) as executor:
+        queue = manager.Queue()
+        futures = {executor.submit(process_file, jobs[i][0], jobs[i][1], chunksize, QueueProgress(queue, i)): i
+                   for i in order}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            show_progress()
+            for future in done:
+                i = futures[future]
+                reports[i] = future.result()
+                bars[i].set_description(f"{os.path.basename(jobs[i][0])} ({reports[i]['status']})")
+        show_progress()
+    for bar in bars.values():
+        bar.close()
+    return reports
+
+def write_timing_report(reports, report_file):
+    report = pd.DataFrame(reports, columns=["file", "output", "status", "rows_in", "rows_out",
+                                            "first_pass_s", "second_pass_s", "total_s"])
+    report.to_csv(report_file, index=False)
+    logging.info("Per-file timings:\n" + report.drop(columns="output").to_string(index=False))
+    logging.info(f"Timing report saved to {report_file}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Encode, filter, scale and balance labelled logs.")
+    parser.add_argument("input_path", help="Labelled file or directory of labelled files (CSV, Parquet or Feather)")
+    parser.add_argument("output_dir", help="Directory of the processed files")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Files processed in parallel (default: from the cores and free memory)")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Rows read at a time (default: 100000)")
+    args = parser.parse_args()
+    input_path = args.input_path
+    output_dir = args.output_dir
 
     try:
         os.makedirs(output_dir, exist_ok=True)
@@ -256,36 +443,38 @@ def main():
             # Replace 'cleaned' or 'labelled' (case-insensitive) with 'processed'
             new_base = re.sub(r'(cleaned|labelled)', 'processed', base, flags=re.IGNORECASE)
             if new_base == base:
-                # If neither found, just add _processed before .csv
-                if base.lower().endswith('.csv'):
-                    new_base = base[:-4] + '_processed.csv'
+                # If neither found, just add _processed before the extension
+                if is_frame_file(base):
+                    root, ext = os.path.splitext(base)
+                    new_base = root + '_processed' + ext
                 else:
                     new_base = base + '_processed'
             return os.path.join(output_dir, new_base)
 
         if os.path.isdir(input_path):
             print("Files in directory:", os.listdir(input_path))
-            csv_files = [os.path.join(input_path, f) for f in os.listdir(input_path) if f.lower().endswith('.csv')]
-            print("CSV files to process:", csv_files)
-            if not csv_files:
-                logging.error(f"No CSV files found in directory: {input_path}")
+            input_files = [os.path.join(input_path, f) for f in os.listdir(input_path) if is_frame_file(f)]
+            print("Files to process:", input_files)
+            if not input_files:
+                logging.error(f"No CSV, Parquet or Feather files found in directory: {input_path}")
                 sys.exit(1)
-            logging.info(f"Processing {len(csv_files)} CSV files from directory: {input_path}")
-            for csv_file in csv_files:
-                output_file = make_processed_name(csv_file)
-                stats = first_pass(csv_file)
-                second_pass(csv_file, output_file, stats)
-                logging.info(f"Processed {csv_file} -> {output_file}")
         else:
-            output_file = make_processed_name(input_path)
-            stats = first_pass(input_path)
-            second_pass(input_path, output_file, stats)
-            logging.info(f"Processed {input_path} -> {output_file}")
+            input_files = [input_path]
+
+        workers = args.workers or default_workers(input_files)
+        logging.info(f"Processing {len(input_files)} file(s) from {input_path} with {workers} worker(s)")
+        reports = process_files([(f, make_processed_name(f)) for f in input_files], workers, args.chunksize)
+        # Next to post_processing.log, as merge.py reads every CSV in output_dir
+        write_timing_report(reports, "post_processing_timings.csv")
 
+        failed = [report["file"] for report in reports if report["status"] != "ok"]
+        if failed:
+            logging.error(f"Processing failed for: {failed}")
+            sys.exit(1)
         logging.info("Processing completed successfully")
     except Exception as e:
         logging.error(f"Error during processing: {str(e)}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,189 @@
+"""Mergeable streaming statistics shared by cleanData.py and post_label_process.py.
+
+Every sketch is updated one chunk at a time and merges with sketches of the same
+kind built over other chunks, files or worker processes:
+
+  RunningMoments  count, mean, variance (Welford/Chan), min and max
+  KLLSketch       quantiles (median, IQR) within a small rank error
+  HyperLogLog     distinct counts in fixed memory
+"""
+import numpy as np
+import pandas as pd
+
+NUMBER_TYPES = (int, float, np.integer, np.floating, np.bool_)
+
+
+def canonical_values(series):
+    """
+    Non-null values of a Series as (float64 array of the numbers, object array of the others as
+    str), so that a value compares and hashes the same whatever dtype a chunk was read with:
+    like in a Python set, 1, 1.0 and True are one value.
+    """
+    series = series.dropna()
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype=np.float64) + 0.0, np.empty(0, dtype=object)  # + 0.0 folds -0.0
+    values = series.to_numpy(dtype=object)
+    if pd.api.types.infer_dtype(values, skipna=False) == "string":
+        return np.empty(0), values
+    is_number = np.fromiter((isinstance(value, NUMBER_TYPES) for value in values), dtype=bool, count=len(values))
+    return values[is_number].astype(np.float64) + 0.0, values[~is_number].astype(str).astype(object)
+
+
+class RunningMoments:
+    """Count, mean, sum of squared deviations (M2), min and max of the non-null values seen."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        chunk = RunningMoments()
+        chunk.count = len(values)
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """Combine with the moments of another set of values (Chan et al.)."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance (ddof=1), NaN below two values."""
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty). Level h holds items of weight 2**h; a level
+    over capacity is sorted and every other item, from a random offset, moves up a level.
+    Until the first compaction the sketch holds every value and quantiles are exact.
+    """
+
+    def __init__(self, k=1000, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays at this level
+                keep = items[:1] if len(items) % 2 else items[:0]
+                items = items[len(keep):]
+                promoted = items[self.rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """Value at quantile q in [0, 1]; NaN when no value was seen."""
+        if self.count == 0:
+            return np.nan
+        if len(self.levels) == 1:
+            # Nothing compacted: interpolate like pandas/numpy
+            return float(np.quantile(self.levels[0], q))
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2.0 ** level)
+                                  for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        rank = q * cumulative[-1]
+        return float(items[order][min(np.searchsorted(cumulative, rank), len(items) - 1)])
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter over 64-bit hashes with 2**p registers (about 1.04 / sqrt(2**p) error)."""
+
+    def __init__(self, p=14):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    @staticmethod
+    def hash_values(series):
+        """64-bit hashes of the non-null values of a Series, normalized by canonical_values()."""
+        numbers, others = canonical_values(series)
+        return np.concatenate([pd.util.hash_array(numbers), pd.util.hash_array(others)]).astype(np.uint64)
+
+    def update(self, series):
+        return self.update_hashes(self.hash_values(series))
+
+    def update_hashes(self, hashes):
+        if len(hashes) == 0:
+            return self
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes << np.uint64(self.p)
+        # Bit length of the remaining bits, exact through two 32-bit halves
+        high = (rest >> np.uint64(32)).astype(np.float64)
+        low = (rest & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        bit_length = np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+        rank = np.minimum(64 - bit_length + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(float)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * np.log(m / zeros)  # Linear counting, exact enough for small cardinalities
+        return estimate
@@ -180,6 +180,14 @@ MITRE_XDR_MAPPING = {
 }
 
 
+#  Known timestamp formats of each log source (see "time_formats" in dataset/config.json)
+TIME_FORMATS = {
+    "firewall": ["%Y-%m-%d %H:%M:%S.%f"],
+    "mail": ["%Y-%m-%d %H:%M:%S.%f%z"],
+    "proxy": [],
+    "xdr": ["%Y-%m-%d %H:%M:%S.%f"],
+}
+
 #  Standardized Column Names
 STANDARD_COLUMNS = [
     "timestamp", "log_type", "source_ip", "destination_ip", "action",
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+from config import TIME_FORMATS
+
+NULL_SENTINELS = ["", "null", "None"]
+# Strings of 9+ digits are epoch seconds (or milliseconds), not compact dates such as 20240829
+EPOCH_STRING = r"-?\d{9,}(?:\.\d*)?"
+
+# source -> datetime format inferred from its data, reused by later chunks
+_inferred_formats = {}
+
+
+def _reusable_format(value):
+    """
+    Format guessed from one date string, or None when it reads the day before the month:
+    pd.to_datetime(value) takes such values month first whenever the day is 12 or less,
+    so the format would parse other values differently.
+    """
+    fmt = guess_datetime_format(value)
+    if fmt is None or ("%d" in fmt and "%m" in fmt and fmt.index("%d") < fmt.index("%m")):
+        return None
+    return fmt
+
+
+def _epoch_seconds(parsed):
+    """int(Timestamp.timestamp()) of every value of a tz-aware datetime Series without NaT."""
+    nanoseconds = parsed.dt.as_unit("ns").astype("int64").to_numpy()
+    return pd.Series(np.trunc(np.round(nanoseconds / 1e9, 6)), index=parsed.index)
+
+
+def _parse_dates(strings, source):
+    """Parse date strings as UTC with the known, then the inferred formats, then one by one."""
+    seconds = pd.Series(np.nan, index=strings.index)
+    remaining = strings
+
+    def parse(fmt):
+        nonlocal remaining
+        parsed = pd.to_datetime(remaining, format=fmt, utc=True, errors="coerce").dropna()
+        seconds[parsed.index] = _epoch_seconds(parsed)
+        remaining = remaining.drop(parsed.index)
+        return len(parsed)
+
+    for fmt in TIME_FORMATS.get(source, []):
+        if remaining.empty:
+            return seconds
+        parse(fmt)
+    if remaining.empty:
+        return seconds
+    if source in _inferred_formats:
+        parse(_inferred_formats[source])
+    if not remaining.empty:
+        fmt = _reusable_format(remaining.iloc[0])
+        if fmt is not None and fmt != _inferred_formats.get(source) and parse(fmt):
+            _inferred_formats[source] = fmt
+    if not remaining.empty:
+        # Values no single format covers are parsed individually, like pd.to_datetime(value)
+        parse("mixed")
+    return seconds
+
+
+def convert_to_epoch(series, source=None):
+    """
+    Converts timestamps into epoch time (seconds), a whole column at a time.
+    Numbers (and numeric strings of 9+ digits) are taken as epoch seconds and truncated;
+    date strings are parsed as UTC, trying the known formats of `source` from config.py
+    first and then the format inferred from earlier data. Null sentinels and values that
+    cannot be parsed become NaN.
+    """
+    index = series.index
+    # Work on positions so that duplicate index labels cannot mix up rows
+    series = series.reset_index(drop=True)
+    values = series.where(~series.isin(NULL_SENTINELS))
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        seconds = np.trunc(values.astype(float))
+    else:
+        seconds = pd.Series(np.nan, index=series.index)
+        values = values.dropna()
+        types = values.map(type)
+        strings = values[types == str]
+        epoch_strings = strings.str.fullmatch(EPOCH_STRING)
+        numbers = pd.to_numeric(pd.concat([values[(types != str) & (types != bool)], strings[epoch_strings]]),
+                                errors="coerce")
+        seconds[numbers.index] = np.trunc(numbers.astype(float))
+        dates = strings[~epoch_strings]
+        if not dates.empty:
+            seconds[dates.index] = _parse_dates(dates, source)
+    seconds.index = index
+    # Same dtype as the per-value conversion: integers unless a value is missing
+    return seconds.astype("int64") if seconds.notna().all() else seconds
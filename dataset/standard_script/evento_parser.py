@@ -0,0 +1,50 @@
+import re
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, json is used instead
+    orjson = None
+
+
+def parse_evento(text):
+    """
+    Parse an `evento` payload into a dict, or return None when it cannot be parsed.
+    Payloads are Python-style dicts, so single quotes are turned into double quotes
+    before parsing, as the field extractors always did.
+    """
+    if not isinstance(text, str):
+        return None
+    candidate = text.replace("'", "\"")
+    data = None
+    if orjson is not None:
+        try:
+            data = orjson.loads(candidate)
+        except orjson.JSONDecodeError:
+            pass  # json also accepts NaN/Infinity and arbitrarily large integers
+    if data is None:
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError:
+            return None
+    return data if isinstance(data, dict) else None
+
+
+class EventoFields:
+    """
+    Field access to one `evento` payload, parsed once.
+    Payloads that do not parse fall back to a regex per requested field.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.data = parse_evento(text)
+
+    def get(self, field):
+        """Return the field value as a string, or "Unknown"."""
+        if self.data is not None:
+            return str(self.data.get(field, "Unknown"))
+        if not isinstance(self.text, str):
+            return "Unknown"
+        match = re.search(rf"'{field}':\s*(?:\[)?'([^']+)'", self.text)
+        return match.group(1) if match else "Unknown"
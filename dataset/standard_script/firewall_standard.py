@@ -1,25 +1,11 @@
-import os
 import re
-import numpy as np
-import pandas as pd
 from config import MITRE_MAPPING,MITRE_SIGNATURE_MAPPING,STANDARD_COLUMNS
+from epoch import convert_to_epoch
+from standardize import DEFAULT_CHUNKSIZE, standardize_logs
+from ttp_matcher import TTPMatcher, map_unique
 
-
-#  Function: Convert Various Timestamp Formats to Epoch Time
-def convert_to_epoch(series):
-    """Converts timestamps into epoch time (seconds)."""
-    def parse_time(value):
-        if pd.isna(value) or value in ["", "null", "None"]:
-            return np.nan
-        if isinstance(value, (int, float)):
-            return int(pd.to_datetime(value, unit="s", utc=True).timestamp())
-        if isinstance(value, str):
-            try:
-                return int(pd.to_datetime(value, utc=True).timestamp())
-            except Exception:
-                return np.nan
-        return np.nan
-    return series.apply(parse_time)
+LOG_MATCHER = TTPMatcher(MITRE_MAPPING)
+SIGNATURE_MATCHER = TTPMatcher(MITRE_SIGNATURE_MAPPING)
 
 #  Function: Extract Text Inside Double Quotes from `message`
 def extract_quoted_text(text):
@@ -32,24 +18,12 @@ def extract_quoted_text(text):
 #  Function: Map Log Data to MITRE ATT&CK TTPs
 def map_ttps_from_log(log_data):
     """Maps log data to MITRE ATT&CK TTPs using regex matching."""
-    detected_ttps = set()
-    if not isinstance(log_data, str):
-        return "Unknown"
-    for ttp, pattern in MITRE_MAPPING.items():
-        if re.search(pattern, log_data, re.IGNORECASE):
-            detected_ttps.add(ttp)
-    return ",".join(detected_ttps) if detected_ttps else "Unknown"
+    return LOG_MATCHER.label(log_data)
 
 #  Function: Map Signature-Based TTPs
 def map_ttps_from_signature(signature):
     """Maps firewall signatures to MITRE ATT&CK TTPs."""
-    detected_ttps = set()
-    if not isinstance(signature, str):
-        return "Unknown"
-    for ttp, pattern in MITRE_SIGNATURE_MAPPING.items():
-        if re.search(pattern, signature, re.IGNORECASE):
-            detected_ttps.add(ttp)
-    return ",".join(detected_ttps) if detected_ttps else "Unknown"
+    return SIGNATURE_MATCHER.label(signature)
 
 #  Function: Process Firewall Logs
 def process_firewall_log(df):
@@ -63,11 +37,11 @@ def process_firewall_log(df):
             df[col] = "Unknown"
 
     # Convert timestamp
-    df["timestamp"] = convert_to_epoch(df["eventdate"])
+    df["timestamp"] = convert_to_epoch(df["eventdate"], "firewall")
 
     # Extract the text inside double quotes from `message`
 
-    df["message"] = df["message"].apply(extract_quoted_text)
+    df["message"] = map_unique(df["message"], extract_quoted_text)
     df["threat_name"] = df["signature"].fillna(df["id_signature"]).fillna(df["message"])
     
 
@@ -80,8 +54,8 @@ def process_firewall_log(df):
     df["port"] = df["dst_port"]
 
     # Apply TTP Mapping
-    df["ttp_from_log"] = df.apply(lambda row: map_ttps_from_log(row["protocol"] + " " + row["action"]), axis=1)
-    df["ttp_from_signature"] = df["threat_name"].apply(map_ttps_from_signature)
+    df["ttp_from_log"] = LOG_MATCHER.label_series(df["protocol"] + " " + df["action"])
+    df["ttp_from_signature"] = SIGNATURE_MATCHER.label_series(df["threat_name"])
 
     # Combine TTP detections
     df["ttp_detected"] = df.apply(
@@ -94,16 +68,11 @@ def process_firewall_log(df):
     return df[STANDARD_COLUMNS]
 
 #  Function: Process and Save Logs
-def process_logs():
-    directory = "Datasets/raw/firewall_attack_chunks"
-    for filename in os.listdir(directory):
-        filepath = os.path.join(directory, filename)
-        try:
-            df = pd.read_csv(filepath, low_memory=False).rename(columns=lambda x: x.strip())
-            df = process_firewall_log(df)
-            df.to_csv("Datasets/processed/firewall_logs.csv", index=False, mode="a")
-        except Exception as e:
-            print(f"Error processing {filename}: {e}")
+def process_logs(workers=1, chunksize=DEFAULT_CHUNKSIZE):
+    standardize_logs("firewall", workers=workers, chunksize=chunksize)
+    if workers <= 1:  # Worker processes keep their own caches
+        print(f"Log TTP cache: {LOG_MATCHER.cache_stats()}")
+        print(f"Signature TTP cache: {SIGNATURE_MATCHER.cache_stats()}")
 
 #  Run Processing
 if __name__ == "__main__":
@@ -1,25 +1,12 @@
-import os
 import re
 import json
 import pandas as pd
-import numpy as np
 from config import  MITRE_MAIL_MAPPING, STANDARD_COLUMNS
+from epoch import convert_to_epoch
+from standardize import DEFAULT_CHUNKSIZE, standardize_logs
+from ttp_matcher import TTPMatcher, map_unique
 
-
-def convert_to_epoch(series):
-    """Converts timestamps from various formats into epoch time (seconds)."""
-    def parse_time(value):
-        if pd.isna(value) or value in ["", "null", "None"]:
-            return np.nan
-        if isinstance(value, (int, float)):
-            return int(value)
-        if isinstance(value, str):
-            try:
-                return int(pd.to_datetime(value, utc=True).timestamp())
-            except Exception:
-                return np.nan
-        return np.nan
-    return series.apply(parse_time)
+MAIL_MATCHER = TTPMatcher(MITRE_MAIL_MAPPING)
 
 
 def extract_value(field, text):
@@ -49,13 +36,7 @@ def extract_ip_from_relay(relay_value):
 
 def extract_ttp(log_data):
     """Maps email log data to MITRE ATT&CK TTPs."""
-    detected_ttps = set()
-    if not isinstance(log_data, str):
-        return "Unknown"
-    for ttp, pattern in MITRE_MAIL_MAPPING.items():
-        if re.search(pattern, log_data, re.IGNORECASE):
-            detected_ttps.add(ttp)
-    return ",".join(detected_ttps) if detected_ttps else "Unknown"
+    return MAIL_MATCHER.label(log_data)
 
 def extract_mail_fields(evento):
     """Extracts fields from mail logs  for TTP mapping."""
@@ -157,11 +138,11 @@ def process_mail_log(df):
             df[col] = "Unknown"
 
     # Extract fields
-    extracted = df["evento"].apply(extract_mail_fields) 
+    extracted = map_unique(df["evento"], extract_mail_fields)
     extracted_df = pd.DataFrame(extracted.tolist())
 
     # Convert timestamp to epoch
-    df["timestamp"] = df["ts"].combine_first(df["messageTime"]).pipe(convert_to_epoch)
+    df["timestamp"] = df["ts"].combine_first(df["messageTime"]).pipe(convert_to_epoch, "mail")
     df["log_type"] = "mail"
 
     # Combine extracted fields with the original DataFrame
@@ -171,17 +152,11 @@ def process_mail_log(df):
     return df[STANDARD_COLUMNS]
 
 
-def process_logs():
+def process_logs(workers=1, chunksize=DEFAULT_CHUNKSIZE):
     """Process all mail logs in the directory."""
-    directory = "Datasets/raw/mail_attack_chunks"
-    for filename in os.listdir(directory):
-        filepath = os.path.join(directory, filename)
-        try:
-            df = pd.read_csv(filepath, low_memory=False).rename(columns=lambda x: x.strip())
-            df = process_mail_log(df)
-            df.to_csv("Datasets/processed/mail_logs.csv", index=False, mode="a")
-        except Exception as e:
-            print(f"Error processing {filename}: {e}")
+    standardize_logs("mail", workers=workers, chunksize=chunksize)
+    if workers <= 1:  # Worker processes keep their own caches
+        print(f"Mail TTP cache: {MAIL_MATCHER.cache_stats()}")
 
 
 if __name__ == "__main__":
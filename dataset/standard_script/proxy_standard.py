@@ -1,24 +1,11 @@
-import os
-import re
-import json
 import pandas as pd
-import numpy as np
 from config import MITRE_PROXY_MAPPING, STANDARD_COLUMNS
+from epoch import convert_to_epoch
+from evento_parser import EventoFields
+from standardize import DEFAULT_CHUNKSIZE, standardize_logs
+from ttp_matcher import TTPMatcher, map_unique
 
-def convert_to_epoch(series):
-    """Converts timestamps from various formats into epoch time (seconds)."""
-    def parse_time(value):
-        if pd.isna(value) or value in ["", "null", "None"]:
-            return np.nan
-        if isinstance(value, (int, float)):
-            return int(value)
-        if isinstance(value, str):
-            try:
-                return int(pd.to_datetime(value, utc=True).timestamp())
-            except Exception:
-                return np.nan
-        return np.nan
-    return series.apply(parse_time)
+PROXY_MATCHER = TTPMatcher(MITRE_PROXY_MAPPING)
 
 
 # def map_ttps_from_proxy(log_data):
@@ -35,42 +22,17 @@ def convert_to_epoch(series):
 
 def map_ttps_from_proxy(evento):
     """Maps proxy log data in the `evento` column to MITRE ATT&CK TTPs."""
-    detected_ttps = set()
-
     # Ensure evento is a valid string
     if not isinstance(evento, str) or not evento.strip():
         return "Unknown"
-
-    # try:
-    #     # Parse the evento JSON string
-    #     evento_data = json.loads(evento.replace("'", "\""))  # Handle single quotes if present
-    # except json.JSONDecodeError:
-    #     return "Unknown"
-
-    # # Flatten the data into a single string for regex matching
-    # log_content = " ".join([str(value) for value in evento_data.values() if value])
-
-    # Check for each TTP in the log content
-    for ttp, pattern in MITRE_PROXY_MAPPING.items():
-        if re.search(pattern, evento, re.IGNORECASE):
-            detected_ttps.add(ttp)
-
-    return ",".join(detected_ttps) if detected_ttps else "Unknown"
+    return PROXY_MATCHER.label(evento)
 
 
 def extract_value(field, text):
     """
     Extracts a field value from JSON-like text. Handles integers, strings, and nested fields.
     """
-    if not isinstance(text, str):
-        return  "Unknown"
-    try:
-        data = json.loads(text.replace("'", "\"")) 
-        return str(data.get(field, "Unknown"))
-    except (json.JSONDecodeError, TypeError):
-        pass  
-    match = re.search(rf"'{field}':\s*(?:\[)?'([^']+)'", text)
-    return match.group(1) if match else "Unknown"
+    return EventoFields(text).get(field)
 
 
 def extract_proxy_fields(evento):
@@ -87,16 +49,17 @@ def extract_proxy_fields(evento):
             "ttp_detected": "Unknown"
         }
 
-    # Extract key fields
-    source_ip =  extract_value("srcip",evento)
-    destination_ip = extract_value("dstip", evento)
-    user = extract_value("userip", evento)
-    action = extract_value("action", evento)
-    protocol = extract_value("protocol", evento)
-    port = extract_value("dstport", evento)
-    threat_name = extract_value("alert_name", evento) 
+    # Extract key fields from the payload, parsed once
+    fields = EventoFields(evento)
+    source_ip =  fields.get("srcip")
+    destination_ip = fields.get("dstip")
+    user = fields.get("userip")
+    action = fields.get("action")
+    protocol = fields.get("protocol")
+    port = fields.get("dstport")
+    threat_name = fields.get("alert_name") 
     if threat_name == "Unknown":
-        threat_name = extract_value("category", evento)
+        threat_name = fields.get("category")
     # Extract MITRE ATT&CK TTPs
     log_content = f"{user} {action} {protocol} {threat_name}"
     ttp_detected = map_ttps_from_proxy(evento)
@@ -120,34 +83,25 @@ def process_proxy_log(df):
         raise ValueError("Column 'evento' is missing in the input DataFrame.")
 
     # Extract fields
-    extracted = df["evento"].apply(extract_proxy_fields)
+    extracted = map_unique(df["evento"], extract_proxy_fields)
     extracted_df = pd.DataFrame(extracted.tolist())
 
     df = df.drop(columns=["user", "protocol", "port","action"], errors="ignore")
     # Combine extracted fields with the original DataFrame
     df = pd.concat([df, extracted_df], axis=1)
     # Convert timestamp to epoch
-    df["timestamp"] = convert_to_epoch(df["timestamp"])
+    df["timestamp"] = convert_to_epoch(df["timestamp"], "proxy")
     df["log_type"] = "proxy"
 
     # Select and return standardized columns
     return df[STANDARD_COLUMNS]
 
 
-def process_logs():
+def process_logs(workers=1, chunksize=DEFAULT_CHUNKSIZE):
     """Processes all proxy logs in the specified directory."""
-    directory = "Datasets/raw/proxy_attack_chunks"
-    output_file = "Datasets/processed/proxy_logs.csv"
-
-    for filename in os.listdir(directory):
-        filepath = os.path.join(directory, filename)
-        try:
-            df = pd.read_csv(filepath, low_memory=False).rename(columns=lambda x: x.strip())
-            df = process_proxy_log(df)
-            df.to_csv(output_file, index=False, mode="a")
-            print(f"Processed {filename} successfully.")
-        except Exception as e:
-            print(f"Error processing {filename}: {e}")
+    standardize_logs("proxy", workers=workers, chunksize=chunksize)
+    if workers <= 1:  # Worker processes keep their own caches
+        print(f"Proxy TTP cache: {PROXY_MATCHER.cache_stats()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+import os
+import time
+import argparse
+import importlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+# log type -> (module, processing function, raw chunk directory, output file)
+LOG_SOURCES = {
+    "firewall": ("firewall_standard", "process_firewall_log",
+                 "Datasets/raw/firewall_attack_chunks", "Datasets/processed/firewall_logs.csv"),
+    "mail": ("mail_standard", "process_mail_log",
+             "Datasets/raw/mail_attack_chunks", "Datasets/processed/mail_logs.csv"),
+    "proxy": ("proxy_standard", "process_proxy_log",
+              "Datasets/raw/proxy_attack_chunks", "Datasets/processed/proxy_logs.csv"),
+    "xdr": ("xdr_standard", "process_xdr_log",
+            "Datasets/raw/xdr_alerts_attack_chunks", "Datasets/processed/xdr_logs.csv"),
+}
+DEFAULT_CHUNKSIZE = 100000
+
+
+class StageTimer:
+    """Accumulates rows and seconds per pipeline stage and reports rows/sec."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage, rows, seconds):
+        total_rows, total_seconds = self.stages.get(stage, (0, 0.0))
+        self.stages[stage] = (total_rows + rows, total_seconds + seconds)
+
+    def report(self, title):
+        print(f"{title}:")
+        for stage, (rows, seconds) in self.stages.items():
+            rate = rows / seconds if seconds > 0 else float("inf")
+            print(f"  {stage:<8} {rows} rows in {seconds:.1f}s ({rate:.0f} rows/s)")
+
+
+def standardize_chunk(module_name, function_name, chunk):
+    """Run a standardizer on one chunk; returns the result and the seconds it took."""
+    start = time.perf_counter()
+    process = getattr(importlib.import_module(module_name), function_name)
+    # The standardizers concatenate extracted columns by position, so start the index at 0
+    result = process(chunk.reset_index(drop=True))
+    return result, time.perf_counter() - start
+
+
+def standardize_logs(log_type, workers=1, chunksize=DEFAULT_CHUNKSIZE, directory=None, output_file=None):
+    """
+    Standardize every raw chunk file of a log type into one output CSV.
+    Files are read in chunks of `chunksize` rows; with workers > 1 the chunks are
+    standardized in a process pool, at most 2 * workers at a time. Results are
+    written in file and chunk order, with a single header.
+    """
+    module_name, function_name, default_directory, default_output = LOG_SOURCES[log_type]
+    directory = directory or default_directory
+    output_file = output_file or default_output
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    timer = StageTimer()
+    pending = deque()
+    header = True
+    wall_start = time.perf_counter()
+
+    def write_oldest():
+        nonlocal header
+        label, rows_in, work = pending.popleft()
+        try:
+            result, seconds = work.result() if executor else work
+        except Exception as e:
+            print(f"Error processing {label}: {e}")
+            return
+        timer.add("process", rows_in, seconds)
+        start = time.perf_counter()
+        result.to_csv(output_file, index=False, header=header, mode="w" if header else "a")
+        header = False
+        timer.add("write", len(result), time.perf_counter() - start)
+
+    try:
+        for filename in sorted(os.listdir(directory)):
+            filepath = os.path.join(directory, filename)
+            try:
+                reader = pd.read_csv(filepath, low_memory=False, chunksize=chunksize)
+                index = 0
+                while True:
+                    start = time.perf_counter()
+                    chunk = next(reader, None)
+                    if chunk is None:
+                        break
+                    chunk = chunk.rename(columns=lambda x: x.strip())
+                    timer.add("read", len(chunk), time.perf_counter() - start)
+                    label = f"{filename} (chunk {index})"
+                    if executor:
+                        work = executor.submit(standardize_chunk, module_name, function_name, chunk)
+                    else:
+                        try:
+                            work = standardize_chunk(module_name, function_name, chunk)
+                        except Exception as e:
+                            print(f"Error processing {label}: {e}")
+                            index += 1
+                            continue
+                    pending.append((label, len(chunk), work))
+                    index += 1
+                    if len(pending) >= 2 * max(workers, 1):
+                        write_oldest()
+            except Exception as e:
+                print(f"Error processing {filename}: {e}")
+        while pending:
+            write_oldest()
+    finally:
+        if executor:
+            executor.shutdown()
+
+    timer.add("total", timer.stages.get("read", (0, 0))[0], time.perf_counter() - wall_start)
+    timer.report(f"Standardized {log_type} logs into {output_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Standardize raw SOC log exports into the common log schema.")
+    parser.add_argument("log_types", nargs="*", metavar="log_type",
+                        help=f"Log types to standardize: {', '.join(LOG_SOURCES)} (default: all)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes standardizing chunks in parallel (default: 1)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"Rows read from a raw file at a time (default: {DEFAULT_CHUNKSIZE})")
+    args = parser.parse_args()
+    unknown = [log_type for log_type in args.log_types if log_type not in LOG_SOURCES]
+    if unknown:
+        parser.error(f"unknown log type(s): {', '.join(unknown)}")
+
+    for log_type in args.log_types or LOG_SOURCES:
+        module = importlib.import_module(LOG_SOURCES[log_type][0])
+        module.process_logs(workers=args.workers, chunksize=args.chunksize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import pandas as pd
+from epoch import convert_to_epoch
+
+
+def expected(values):
+    """Epoch seconds of pd.to_datetime(value) for each value, as the per-value conversion gave."""
+    return [int(pd.to_datetime(value, utc=True).timestamp()) for value in values]
+
+
+def test_ambiguous_day_month_after_unambiguous_chunk():
+    # The format of the first chunk must not turn 01/02 into the 1st of February
+    convert_to_epoch(pd.Series(["22/08/2024 10:00"]), "test-chunks")
+    values = ["01/02/2024 10:00", "22/08/2024 10:00", "12/11/2024 23:59"]
+    assert convert_to_epoch(pd.Series(values), "test-chunks").tolist() == expected(values)
+    assert convert_to_epoch(pd.Series(["01/02/2024 10:00"]), "test-chunks").tolist() == [1704189600]
+
+
+def test_ambiguous_day_month_in_one_chunk():
+    values = ["22/08/2024 10:00", "01/02/2024 10:00", "2024-08-22T10:00:00"]
+    assert convert_to_epoch(pd.Series(values), "test-mixed").tolist() == expected(values)
+
+
+def test_unambiguous_format_is_reused():
+    values = ["2024-01-02 10:00:00", "2024-02-01 10:00:00", "null"]
+    result = convert_to_epoch(pd.Series(values), "test-iso")
+    assert result.iloc[:2].tolist() == expected(values[:2])
+    assert pd.isna(result.iloc[2])
@@ -0,0 +1,132 @@
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+REGEX_METACHARACTERS = set(".^$*+?{}[]()|\\")
+QUANTIFIERS = set("*+?{")
+
+
+def split_alternatives(pattern):
+    """Split a regex on its top-level "|" (outside groups and character classes)."""
+    parts, depth, in_class, start, i = [], 0, False, 0, 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+            if pattern[i + 1:i + 2] == "]":
+                i += 1  # "[]...]": the first "]" is a literal
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            parts.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    parts.append(pattern[start:])
+    return parts
+
+
+def required_literal(alternative):
+    """
+    Return the lowercased literal text every match of `alternative` starts with
+    (after any leading ".*", "^" or "\\b"), or "" when there is none.
+    """
+    i = 0
+    while True:
+        if alternative.startswith(".*", i) and alternative[i + 2:i + 3] not in ("?", "+"):
+            i += 2
+        elif alternative.startswith(("^", "\\b"), i):
+            i += 1 if alternative[i] == "^" else 2
+        else:
+            break
+    literal = []
+    while i < len(alternative):
+        char = alternative[i]
+        if char == "\\":
+            if i + 1 >= len(alternative) or alternative[i + 1].isalnum():
+                break  # \b, \d, \s... are not literal characters
+            char, step = alternative[i + 1], 2
+        elif char in REGEX_METACHARACTERS:
+            break
+        else:
+            step = 1
+        if alternative[i + step:i + step + 1] in QUANTIFIERS:
+            break  # The character is optional or repeated
+        literal.append(char)
+        i += step
+    return "".join(literal).lower()
+
+
+class TTPMatcher:
+    """
+    Maps text to MITRE ATT&CK TTPs with a {ttp: pattern} mapping from config.py.
+    Patterns are compiled once. Every alternative of a pattern is reduced to the literal
+    text its matches must start with, and a pattern is only searched when one of its
+    literals occurs in the lowercased text, so most rows cost a few substring checks
+    instead of one regex scan per TTP. Patterns with an alternative that has no literal
+    are always searched.
+    Labels are kept in an LRU cache of cache_size entries keyed on the normalized text,
+    as the same threat names, subjects and payloads repeat across millions of rows.
+    """
+
+    def __init__(self, mapping, cache_size=16384):
+        self.ttps = list(mapping)
+        self.patterns = [re.compile(pattern, re.IGNORECASE) for pattern in mapping.values()]
+        self.literals = []
+        for pattern in mapping.values():
+            literals = [required_literal(alternative) for alternative in split_alternatives(pattern)]
+            usable = all(literal and literal.isascii() for literal in literals)
+            self.literals.append(literals if usable else None)
+        self._cached_label = lru_cache(maxsize=cache_size)(self._label)
+
+    def matches(self, text):
+        """Return the TTPs whose pattern matches text, in mapping order."""
+        # str.lower() and re's case-insensitive matching only agree on ASCII text
+        lowered = text.lower() if text.isascii() else None
+        detected = []
+        for ttp, pattern, literals in zip(self.ttps, self.patterns, self.literals):
+            if lowered is not None and literals is not None and not any(lit in lowered for lit in literals):
+                continue
+            if pattern.search(text):
+                detected.append(ttp)
+        return detected
+
+    def _label(self, text):
+        ttps = self.matches(text)
+        return ",".join(ttps) if ttps else "Unknown"
+
+    def label(self, text):
+        """Comma-separated TTPs matching text, or "Unknown" (also for non-string input)."""
+        if not isinstance(text, str):
+            return "Unknown"
+        # Every pattern is case-insensitive, so ASCII text differing only in case shares an entry
+        return self._cached_label(text.lower() if text.isascii() else text)
+
+    def label_series(self, series):
+        """label() over a whole pandas Series, computed once per distinct value."""
+        codes, uniques = pd.factorize(series)
+        # Missing values get code -1, i.e. the trailing "Unknown"
+        labels = np.array([self.label(text) for text in uniques] + ["Unknown"], dtype=object)
+        return pd.Series(labels[codes], index=series.index)
+
+    def cache_stats(self):
+        info = self._cached_label.cache_info()
+        lookups = info.hits + info.misses
+        hit_rate = 100 * info.hits / lookups if lookups else 0.0
+        return f"{info.hits} hits, {info.misses} misses ({hit_rate:.1f}% hit rate), {info.currsize} cached"
+
+
+def map_unique(series, func):
+    """series.apply(func) calling func once per distinct value (and once for missing values)."""
+    codes, uniques = pd.factorize(series)
+    results = [func(value) for value in uniques]
+    if (codes == -1).any():
+        results.append(func(np.nan))
+    return pd.Series([results[code] for code in codes], index=series.index, dtype=object)
@@ -1,50 +1,25 @@
 import ast
-import os
-import re
-import json
 import pandas as pd
 import numpy as np
 from config import MITRE_XDR_MAPPING, STANDARD_COLUMNS
+from epoch import convert_to_epoch
+from evento_parser import EventoFields
+from standardize import DEFAULT_CHUNKSIZE, standardize_logs
+from ttp_matcher import TTPMatcher, map_unique
+
+XDR_MATCHER = TTPMatcher(MITRE_XDR_MAPPING)
 
-def convert_to_epoch(series):
-    """Converts timestamps from various formats into epoch time (seconds)."""
-    def parse_time(value):
-        if pd.isna(value) or value in ["", "null", "None"]:
-            return np.nan
-        if isinstance(value, (int, float)):
-            return int(value)
-        if isinstance(value, str):
-            try:
-                return int(pd.to_datetime(value, utc=True).timestamp())
-            except Exception:
-                return np.nan
-        return np.nan
-    return series.apply(parse_time)
 
 def extract_value(field, text):
     """
     Extracts a field value from JSON-like text. Handles integers, strings, and nested fields.
     """
-    if not isinstance(text, str):
-        return  "Unknown"
-    try:
-        data = json.loads(text.replace("'", "\"")) 
-        return str(data.get(field, "Unknown"))
-    except (json.JSONDecodeError, TypeError):
-        pass  
-    match = re.search(rf"'{field}':\s*(?:\[)?'([^']+)'", text)
-    return match.group(1) if match else "Unknown"
+    return EventoFields(text).get(field)
 
 
 def map_ttps_from_xdr(log_data):
     """Maps XDR log data to MITRE ATT&CK TTPs."""
-    detected_ttps = set()
-    if not isinstance(log_data, str):
-        return "Unknown"
-    for ttp, pattern in MITRE_XDR_MAPPING.items():
-        if re.search(pattern, log_data, re.IGNORECASE):
-            detected_ttps.add(ttp)
-    return ",".join(detected_ttps) if detected_ttps else "Unknown"
+    return XDR_MATCHER.label(log_data)
 
 
 def extract_xdr_fields(evento):
@@ -61,20 +36,21 @@ def extract_xdr_fields(evento):
         }
 
 
-    # Extract key fields
-    source_ip = extract_value("host_ip", evento)
+    # Extract key fields from the payload, parsed once
+    fields = EventoFields(evento)
+    source_ip = fields.get("host_ip")
     if source_ip == "Unknown":
-        source_ip = extract_value("host_name",evento)
-    destination_ip = extract_value("action_remote_ip", evento)
+        source_ip = fields.get("host_name")
+    destination_ip = fields.get("action_remote_ip")
     if destination_ip == "Unknown":
-        destination_ip = extract_value("dst_agent_id",evento)
-    user = extract_value("user_name", evento)
-    protocol = extract_value("fw_app_id", evento)
+        destination_ip = fields.get("dst_agent_id")
+    user = fields.get("user_name")
+    protocol = fields.get("fw_app_id")
     
-    port = extract_value('action_local_port', evento) or extract_value('action_remote_port', evento)
-    threat_name = extract_value("mitre_techniques_names", evento)
+    port = fields.get('action_local_port') or fields.get('action_remote_port')
+    threat_name = fields.get("mitre_techniques_names")
     if threat_name == "Unknown":
-        threat_name = extract_value("mitre_tactics_names", evento)
+        threat_name = fields.get("mitre_tactics_names")
     # mitre_tech = extract_value ("mitre_techniques", evento)
     # last_mitre_tech = extract_value ("", evento)
     # Extract MITRE ATT&CK TTPs
@@ -125,7 +101,7 @@ def process_xdr_log(df):
     df = df[df["action"].notna()].copy()
 
     # Extract fields
-    extracted = df["evento"].apply(extract_xdr_fields)
+    extracted = map_unique(df["evento"], extract_xdr_fields)
     extracted_df = pd.DataFrame(extracted.tolist())
 
     df = df.reset_index(drop=True)
@@ -135,7 +111,7 @@ def process_xdr_log(df):
 
 
     # Convert timestamp to epoch
-    df["timestamp"] = convert_to_epoch(df["_eventdate"])
+    df["timestamp"] = convert_to_epoch(df["_eventdate"], "xdr")
     df["log_type"] = "xdr"
     
     # Concatenate MITRE-related columns into a list; if none exist, set to ["Unknown"]
@@ -158,20 +134,9 @@ def process_xdr_log(df):
     return df[STANDARD_COLUMNS]
 
 
-def process_logs():
+def process_logs(workers=1, chunksize=DEFAULT_CHUNKSIZE):
     """Processes all XDR logs in the specified directory."""
-    directory = "Datasets/raw/xdr_alerts_attack_chunks"
-    output_file = "Datasets/processed/xdr_logs.csv"
-
-    for filename in os.listdir(directory):
-        filepath = os.path.join(directory, filename)
-        try:
-            df = pd.read_csv(filepath, low_memory=False).rename(columns=lambda x: x.strip())
-            df = process_xdr_log(df)
-            df.to_csv(output_file, index=False, mode="a")
-            print(f"Processed {filename} successfully.")
-        except Exception as e:
-            print(f"Error processing {filename}: {e}")
+    standardize_logs("xdr", workers=workers, chunksize=chunksize)
 
 
 if __name__ == "__main__":